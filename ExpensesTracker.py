@@ -8,17 +8,20 @@ from tkinter import messagebox
 
 from tksheet import Sheet
 
-import pycountry #import pycountry for currency codes
-
-import requests #import requests for API calls
+from currency_index import load_currency_index #sorted index of currency codes (built from pycountry once)
 
 from dotenv import load_dotenv #import dotenv to load environment variables
 import os
 
+from rates import RateCache, HistoricalRates, RateError #cached exchange rates (one API call per hour)
+from settings import load_settings #base currency chosen in the enhanced version (settings.json)
+from datetime import date as calendar_date
+
 category = ["life expenses", "electricity", "gas", "rental", "grocery", "savings", "education", "charity"]
 payment_method = [ "Cash", "Credit Card", "Debit Card", "Mobile Payment", "Bank Transfer", "Check"]
 
 total_egp = 0.0 
+base_currency = load_settings()["base_currency"] #currency of the total, EGP unless changed
 
 currency_listbox = None
 
@@ -26,6 +29,9 @@ currency_listbox = None
 # Load API Key
 load_dotenv()
 apikey = os.getenv("MY_SECRET_KEY")
+rate_cache = RateCache(apikey)
+currency_index = load_currency_index()
+history = HistoricalRates(apikey) #rates of past days, filled by "python rates.py backfill"
 
 #Making the ctkinter appearance and theme
 
@@ -35,12 +41,7 @@ ctk.set_default_color_theme("blue")
 def get_currency_suggestions(text):    #function to get suggestions from pycountry library based on the entry of the user
     if not text:
         return []
-    text = text.upper()
-    suggestions = []
-    for currency in pycountry.currencies:
-        if currency.alpha_3.startswith(text):
-            suggestions.append(currency.alpha_3)
-    return suggestions[:8]
+    return currency_index.search(text, limit=8)
 
 def show_suggestions(entry_widget, event):   #function to show the suggestions in a list under the Entry box
     text = entry_widget.get()
@@ -82,32 +83,31 @@ def fill_currency(event):    #function to fill the entry with the chosen currenc
 def update_total_label(new_value):   #function to calcoulate the total 
     global total_egp
     total_egp += float(new_value)
-    total_label_value.configure(text=f"Total: {total_egp} EGP")
-
+    total_label_value.configure(text=f"Total: {total_egp} {base_currency}")
 
-def rates(user_currancy):    #getting the rates from currancy freaks API request
 
-    url = f"https://api.currencyfreaks.com/v2.0/rates/latest?apikey={apikey}"
+def rates(user_currancy, day=None):    #getting the rates from the cache, it calls currancy freaks API only when the rates are old
 
     try:
-        response = requests.get(url)
+        if day is not None and history.has_day(day):   #back-dated expense with a stored rate of its own day
+            user_rate, egp_rate = history.lookup(day, user_currancy, base_currency)
+            return float(user_rate), float(egp_rate)
 
-        if response.status_code != 200:
-            messagebox.showerror("Error", "Failed to retrieve exchange rates.")
-            return
-        
-        data = response.json()
-        rates = data.get("rates", {})
+        rates = rate_cache.get_rates()
 
         if user_currancy not in rates:
             messagebox.showerror("Error", f"Currency '{user_currancy}' not supported.")
             return None
          
         user_rate = float(rates[user_currancy])
-        egp_rate = float(rates["EGP"])
+        egp_rate = float(rates[base_currency])
             
         return user_rate, egp_rate
     
+    except RateError as e:
+        messagebox.showerror("Error", str(e))
+        return
+
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {e}")
         return
@@ -134,11 +134,11 @@ def add_expense():   #function to add the expense to the sheet #attched to add e
         return
     
 
-    if currency == "EGP":
+    if currency == base_currency:
         amount_egp = amount
 
     else:
-        user_rate, egp_rate = rates(currency)
+        user_rate, egp_rate = rates(currency, calendar_date.fromisoformat(date))
         
         amount_usd = round( amount / user_rate  , 2)
         amount_egp = round( amount_usd * egp_rate , 2)
@@ -317,7 +317,7 @@ table_wrapper.grid_columnconfigure(0, weight=1)
 
 sheet = Sheet(
     table_wrapper,
-    headers=["Amount", "Currency","Amount in EGP", "Category", "Payment Method", "Date"],
+    headers=["Amount", "Currency",f"Amount in {base_currency}", "Category", "Payment Method", "Date"],
     height=500,
     width=1400,
     column_width=150,
@@ -336,7 +336,7 @@ sheet.grid(row=0, column=0, sticky="nsew")
 
 sheet.column_width(0, 150)   # Amount
 sheet.column_width(1, 150)   # Currency
-sheet.column_width(2, 150)   # Amount in EGP
+sheet.column_width(2, 150)   # Amount in the base currency
 sheet.column_width(3, 280)   # Category
 sheet.column_width(4, 300)   # Payment Method
 sheet.column_width(5, 320)   # Date
@@ -383,7 +383,7 @@ total_frame.grid(row=4, column=1, pady=(10, 40), padx=20, sticky="ew")
 #------------------------- Total Label -----------------#
 total_label_title = ctk.CTkLabel(
     total_frame,
-    text="Total Amount (EGP):",
+    text=f"Total Amount ({base_currency}):",
     font=("Arial", 20, "bold"),
     text_color="#79AFE6"
 )
@@ -391,7 +391,7 @@ total_label_title.grid(row=0, column=0, padx=20, pady=15, sticky="w")
 
 total_label_value = ctk.CTkLabel(
     total_frame,
-    text="0.00 EGP",
+    text=f"0.00 {base_currency}",
     font=("Arial", 22, "bold"),
     text_color="#4ADE80"   
 )
@@ -2,22 +2,60 @@
 # Improved Validation • Better UI/UX • Stable Logic • Enhanced Error Handling
 # ------------------------------------------------------------------------------------
 
+import time
+STARTUP_T0 = time.perf_counter()  # measured by --profile-startup
+
+import sys
 import tkinter as tk
-from tkinter import messagebox
+from tkinter import messagebox, filedialog
 from tkcalendar import DateEntry
 import customtkinter as ctk
 from tksheet import Sheet
-import pycountry
-import requests
-from dotenv import load_dotenv
 import os
+import queue
+import threading
 from datetime import datetime, date
-import re
+from decimal import Decimal, InvalidOperation
+
+from storage import open_storage
+from expense_store import COLUMNS, ExpenseStore, Expense, convert_amount, convert_column, from_cents, quantize, to_cents
+from expense_index import ExpenseIndex
+from sort_index import SortIndex
+from rollups import ExpenseRollups, month_of
+from rates import RateCache, HistoricalRates, RateError
+from currency_index import load_currency_index
+from settings import load_settings, save_settings
+from validation import validate_amount, validate_currency
+from importer import import_file, rejects_file, write_rejects
+from exporter import export, select
+from undo import UndoLog
+import instrument
+from instrument import timed
+
+STARTUP_IMPORTS = time.perf_counter()
 
 # ===================== CONFIG =====================
-load_dotenv()
-API_KEY = os.getenv("MY_SECRET_KEY")
+# pycountry, requests and python-dotenv are loaded on first use
+# (currency_index.py / rates.py), not at startup
 DATA_FILE = "expenses.txt"
+DB_FILE = "expenses.sqlite3"  # used instead of DATA_FILE after "python storage.py migrate"
+RATES_FILE = "rates_cache.json"
+HISTORY_FILE = "rates_history.sqlite3"
+CURRENCY_FILE = "currency_index.json"
+SETTINGS_FILE = "settings.json"
+SUGGEST_DELAY = 120  # ms of typing pause before the dropdown is rebuilt
+LOAD_CHUNK = 2000  # rows added to the sheet per Tk cycle while loading
+PAGE_SIZE = 500  # rows held by the sheet at once, the rest stay in the store
+SCROLL_STEP = 50  # rows moved per click on the page scrollbar arrows
+FILTER_DELAY = 150  # ms of typing pause before the filters are applied
+UNDO_DEPTH = 100  # changes that can be undone with Ctrl+Z
+REJECTED_SHOWN = 10  # unreadable rows listed after loading, the rest are counted
+STARTUP_LOG = "startup_profile.log"
+IMPORT_BUDGET_MS = 400  # --profile-startup warns when imports take longer
+PROFILE_STARTUP = "--profile-startup" in sys.argv
+PERF_LOG = "perf_histograms.log"  # per-operation timings appended on exit
+LATENCY_POLL = 500  # ms between refreshes of the latency readout
+SLOW_MS = 100  # operations slower than this show in the warning color
 
 ctk.set_appearance_mode("dark")
 ctk.set_default_color_theme("blue")
@@ -46,58 +84,51 @@ payments = [
     "Mobile Payment", "Bank Transfer", "Check", "Digital Wallet"
 ]
 
-total_egp = 0.0
+ALL_CATEGORIES = "All Categories"
+ALL_PAYMENTS = "All Payments"
+BULK_CATEGORY = "Set Category..."
+BULK_PAYMENT = "Set Payment Method..."
+
+REPORT_VIEWS = {
+    "By Month": "month",
+    "By Category": "category",
+    "By Payment": "payment",
+    "By Currency": "currency",
+}
+THIS_MONTH = "This Month"
+
+BASE_CHOICES = ["EGP", "USD", "EUR", "GBP", "SAR", "AED"]
+
+settings = load_settings(SETTINGS_FILE)
+base_currency = settings["base_currency"]  # currency of the converted column
+
+total_base = Decimal("0")
+rebasing = False
+importing = False
+native_striping = False
+fetches_running = 0
+polling_rates = False
+suggest_job = None
+currency_index = None
+opening = False  # storage.open() running on a worker thread
+loader = None
+view_offset = 0  # position of the sheet's first row in the (filtered, sorted) view
+filter_job = None
+active_filter = {}  # last valid filter bar values, as ExpenseIndex.search() arguments
+filter_keys = None  # ordering keys of the matching rows, None when nothing is filtered
+sort_column = None  # field the view is sorted by, None for store order
+sort_descending = False
+view_keys = None  # ordering keys of the rows in view order, None when the view is the store as is
+header_click = None  # x of a press on the column headers that may become a sort
+filter_error = False
+report_window = None
+startup_marks = [("imports", STARTUP_IMPORTS)]
+latency_seen = 0  # sequence number of the timing in the latency readout
+shown_suggestions = []
 selected_row = None
 is_editing = False
 
 # ===================== VALIDATION =====================
-def validate_amount(amount_str):
-    """Validate amount input"""
-    if not amount_str or amount_str.strip() == "":
-        return False, "Amount is required"
-    
-    # Remove spaces and check for valid number format
-    amount_str = amount_str.strip()
-    
-    # Allow decimal numbers with optional comma separators
-    if not re.match(r'^\d+\.?\d*$', amount_str):
-        return False, "Invalid amount format. Use numbers only (e.g., 100 or 100.50)"
-    
-    try:
-        amount = float(amount_str)
-        if amount <= 0:
-            return False, "Amount must be greater than zero"
-        if amount > 999999999:
-            return False, "Amount is too large"
-        return True, amount
-    except ValueError:
-        return False, "Invalid number format"
-
-def validate_currency(currency_str):
-    """Validate currency code"""
-    if not currency_str or currency_str.strip() == "":
-        return False, "Currency is required"
-    
-    currency_str = currency_str.strip().upper()
-    
-    if len(currency_str) != 3:
-        return False, "Currency code must be 3 letters (e.g., USD, EUR, SAR)"
-    
-    # Check if valid ISO currency code
-    try:
-        pycountry.currencies.get(alpha_3=currency_str)
-        return True, currency_str
-    except:
-        return False, f"Invalid currency code: {currency_str}"
-
-def validate_date(date_str):
-    """Validate date format"""
-    try:
-        datetime.strptime(date_str, "%Y-%m-%d")
-        return True, date_str
-    except:
-        return False, "Invalid date format"
-
 def validate_inputs(amount, currency, category, payment):
     """Comprehensive input validation"""
     errors = []
@@ -108,7 +139,7 @@ def validate_inputs(amount, currency, category, payment):
         errors.append(result)
     
     # Validate currency
-    is_valid, result = validate_currency(currency)
+    is_valid, result = validate_currency(currency, get_currency_index())
     if not is_valid:
         errors.append(result)
     
@@ -123,124 +154,899 @@ def validate_inputs(amount, currency, category, payment):
     return len(errors) == 0, errors
 
 # ===================== HELPERS =====================
+def get_currency_index():
+    """Currency index, built on first use instead of at startup"""
+    global currency_index
+    if currency_index is None:
+        currency_index = load_currency_index(CURRENCY_FILE)
+        # Most recent expenses first, so the last used currencies lead suggestions
+        for code in reversed(list(dict.fromkeys(store.columns["currency"][:100]))[:10]):
+            currency_index.note_used(code)
+    return currency_index
+
 def get_currency_suggestions(text):
-    """Get currency suggestions with caching"""
+    """Get currency suggestions from the prefix index (codes and names)"""
     if not text or len(text) < 1:
         return []
-    text = text.upper()
-    suggestions = []
-    for c in pycountry.currencies:
-        if c.alpha_3.startswith(text):
-            suggestions.append(c.alpha_3)
-        if len(suggestions) >= 10:
+    return get_currency_index().search(text, limit=10)
+
+@timed
+def fetch_rates(days=()):
+    """Fetch exchange rates on worker threads, the UI keeps running
+
+    Past days are backfilled into the historical table, anything else
+    (including days already stored that lack a currency) refreshes the
+    latest rates.
+    """
+    global fetches_running
+    today = date.today()
+    past = [d for d in days if d < today and d not in history.failed and not history.has_day(d)]
+    if past and history.fetch_async(past, rate_results):
+        fetches_running += 1
+    if (not past or len(past) < len(days)) and rate_cache.fetch_async(rate_results):
+        fetches_running += 1
+    
+    if fetches_running:
+        status_label.configure(text="⏳ Fetching exchange rates...", text_color=TEXT_SECONDARY)
+        if not polling_rates:
+            poll_rates()
+
+def poll_rates():
+    """Pick up the workers' results on the Tk thread"""
+    global fetches_running, polling_rates
+    errors = []
+    received = 0
+    while True:
+        try:
+            error = rate_results.get_nowait()
+        except queue.Empty:
             break
-    return suggestions
-
-def fetch_rates(currency):
-    """Fetch exchange rates with error handling"""
-    if currency == "EGP":
-        return None, None
+        received += 1
+        if error is not None:
+            errors.append(str(error))
+    fetches_running -= received
+    
+    polling_rates = fetches_running > 0
+    if polling_rates:
+        window.after(100, poll_rates)
+    
+    if not received:
+        return
+    if errors:
+        messagebox.showerror("Error", "\n".join(dict.fromkeys(errors)))
+    if rate_cache.stale:
+        status_label.configure(text="⚠ Offline: using cached exchange rates", text_color=WARNING)
+    elif not fetches_running:
+        status_label.configure(text="")
+    # After a failed fetch, don't retry straight away (that would loop while offline)
+    convert_pending(refetch=not errors)
+
+def rates_for(exp_date, currency, base=None):
+    """Rates of the expense date from local tables, None if they must be fetched"""
+    base = base or base_currency
+    if history.has_day(exp_date):
+        try:
+            return history.lookup(exp_date, currency, base)
+        except RateError:
+            pass  # that day's table lacks the currency, use the latest rates
+    elif exp_date < date.today() and exp_date not in history.failed:
+        return None  # back-dated: fetch that day once
+    if rate_cache.is_fresh() or rate_cache.stale:
+        return rate_cache.lookup(currency, base)
+    return None
+
+def convert_to_base(amount_value, currency, exp_date):
+    """Base currency value at the expense date's rate, or None while rates are fetched"""
+    if currency == base_currency:
+        return amount_value
+    rates = rates_for(exp_date, currency)
+    if rates is None:
+        fetch_rates([exp_date])
+        return None  # row shows as pending until the rates arrive
+    usd_rate, base_rate = rates
+    return convert_amount(amount_value, usd_rate, base_rate)
+
+@timed
+def convert_pending(refetch=True):
+    """Fill in the base currency amount of every row waiting for exchange rates
+
+    Every row that can be converted is saved as one batch (one storage
+    write) and the view is redrawn once.
+    """
+    failed = set()
+    waiting = set()
+    pairs = {}  # (day, currency) -> rates, each looked up once
+    changes = []
+    for idx in list(store.pending_rows()):
+        expense = store.row(idx)
+        key = (expense.date, expense.currency)
+        if key not in pairs:
+            try:
+                pairs[key] = rates_for(expense.date, expense.currency)
+            except RateError:
+                pairs[key] = RateError
+        rates = pairs[key]
+        if rates is RateError:
+            failed.add(expense.currency)
+            continue
+        if rates is None:
+            waiting.add(expense.date)
+            continue
+        usd_rate, base_rate = rates
+        changes.append((idx, expense._replace(converted=convert_amount(expense.amount, usd_rate, base_rate))))
+    
+    if changes:
+        persist(store.update_many, changes)
+        redraw_view()
+    update_total()
+    if waiting and refetch:
+        fetch_rates(waiting)
+    if failed:
+        messagebox.showerror("Error", f"No exchange rate for: {', '.join(sorted(failed))}")
+
+# ===================== BASE CURRENCY =====================
+# Switching the base currency re-derives the converted column from the
+# original amounts in one batch: a worker thread converts a copy of the
+# columns with the rates already stored locally (each day / currency pair
+# looked up once, no network), then the Tk thread applies the result as a
+# single storage write. Days without local rates stay pending and are
+# fetched by convert_pending() afterwards.
+def sheet_headers():
+    headers = ["Amount", "Currency", f"Amount ({base_currency})", "Category", "Payment Method", "Date", "Due Date"]
+    if sort_column is not None:
+        headers[COLUMNS.index(sort_column)] += " ▼" if sort_descending else " ▲"
+    return headers
+
+def change_base_currency(code=None):
+    """Switch the base currency and re-convert every row in the background"""
+    global base_currency, rebasing
+    code = (code or base_box.get()).strip().upper()
+    if code == base_currency:
+        return
+    if rebasing or importing or opening or loader is not None:
+        base_box.set(base_currency)
+        messagebox.showwarning("Warning", "Please wait until the current operation finishes")
+        return
+    is_valid, result = validate_currency(code, get_currency_index())
+    if not is_valid:
+        base_box.set(base_currency)
+        messagebox.showerror("Validation Error", result)
+        return
+    
+    # Copy the columns the worker needs (amounts in cents), rows are matched back by key.
+    # The converted amount tells rows re-converted meanwhile apart.
+    keys = list(store.keys)
+    columns = store.columns
+    sources = list(zip(columns["amount"], columns["currency"], columns["date"], columns["converted"]))
+    
+    def rate_pair(day, currency):
+        try:
+            return rates_for(day, currency, code)
+        except RateError:
+            return None  # stays pending, reported by convert_pending()
+    
+    def worker():
+        try:
+            results = convert_column(
+                ((from_cents(cents), currency, day) for cents, currency, day, _ in sources), code, rate_pair
+            )
+            rebase_results.put((previous, code, keys, sources, results, None))
+        except Exception as e:
+            rebase_results.put((previous, code, keys, sources, None, e))
     
+    # New rows are converted to the new base right away
+    previous = base_currency
+    base_currency = code
+    rebasing = True
+    base_box.set(code)
+    base_box.configure(state="disabled")
+    sheet.headers(sheet_headers())
+    status_label.configure(text=f"⏳ Re-converting to {code}...", text_color=TEXT_SECONDARY)
+    threading.Thread(target=worker, daemon=True).start()
+    poll_rebase()
+
+def poll_rebase():
+    """Wait on the Tk thread for the re-conversion worker"""
     try:
-        url = f"https://api.currencyfreaks.com/v2.0/rates/latest?apikey={API_KEY}"
-        response = requests.get(url, timeout=10)
-        
-        if response.status_code != 200:
-            raise Exception("Failed to fetch exchange rates")
-        
-        rates = response.json()["rates"]
-        
-        if currency not in rates:
-            raise Exception(f"Currency {currency} not found in rates")
-        
-        return float(rates[currency]), float(rates["EGP"])
-    
-    except requests.exceptions.Timeout:
-        messagebox.showerror("Error", "Connection timeout. Please check your internet.")
-        return None, None
-    except requests.exceptions.ConnectionError:
-        messagebox.showerror("Error", "No internet connection.")
-        return None, None
+        result = rebase_results.get_nowait()
+    except queue.Empty:
+        window.after(50, poll_rebase)
+        return
+    finish_rebase(*result)
+
+@timed
+def finish_rebase(previous, code, keys, sources, results, error):
+    """Apply the re-converted column as one batch"""
+    global rebasing
+    rebasing = False
+    base_box.configure(state="normal")
+    if error is not None:
+        messagebox.showerror("Error", f"Failed to re-convert expenses: {str(error)}")
+        restore_base(previous, keys, sources)
+        return
+    
+    columns = store.columns
+    amounts, currencies, days, converted = (
+        columns["amount"], columns["currency"], columns["date"], columns["converted"]
+    )
+    # Same keys as when the worker started: positions did not move
+    unchanged = store.keys == keys
+    changes = []
+    for i, (key, source, value) in enumerate(zip(keys, sources, results)):
+        if unchanged:
+            idx = i
+        else:
+            try:
+                idx = store.index_of(key)
+            except KeyError:
+                continue  # deleted meanwhile
+        if (amounts[idx], currencies[idx], days[idx], converted[idx]) != source:
+            continue  # edited or converted meanwhile, already in the new base
+        if converted[idx] != (None if value is None else to_cents(value)):
+            changes.append((idx, store.row(idx)._replace(converted=value)))
+    
+    old_cents = [(idx, converted[idx]) for idx, _ in changes]
+    try:
+        store.update_many(changes)
+        undo_log.clear()  # the logged rows hold amounts in the old base
+        settings["base_currency"] = code
+        save_settings(settings, SETTINGS_FILE)
+        status_label.configure(text=f"✓ Amounts re-converted to {code}", text_color=SUCCESS)
+        window.after(3000, lambda: status_label.configure(text=""))
     except Exception as e:
-        messagebox.showerror("Error", f"Exchange rate error: {str(e)}")
-        return None, None
+        messagebox.showerror("Save Error", f"Failed to save data: {str(e)}")
+        try:
+            # The columns are changed before the write, put the old amounts back
+            store.update_many([
+                (idx, store.row(idx)._replace(converted=None if cents is None else from_cents(cents)))
+                for idx, cents in old_cents
+            ])
+        except Exception:
+            pass  # the storage keeps failing, the columns are back to the old base anyway
+        restore_base(previous, keys, sources)
+        return
+    
+    redraw_view()
+    update_total()
+    if next(store.pending_rows(), None) is not None:
+        convert_pending()
+
+def restore_base(previous, keys, sources):
+    """Go back to the previous base currency after a failed re-conversion
+
+    Rows added or edited while the worker ran were converted to the new
+    base: they are marked pending and converted to the previous one again.
+    """
+    global base_currency
+    base_currency = previous
+    base_box.set(previous)
+    sheet.headers(sheet_headers())
+    
+    started = dict(zip(keys, sources))
+    columns = store.columns
+    changes = []
+    for idx, source in enumerate(zip(
+        columns["amount"], columns["currency"], columns["date"], columns["converted"]
+    )):
+        if source[3] is not None and started.get(store.keys[idx]) != source:
+            changes.append((idx, store.row(idx)._replace(converted=None)))
+    if changes:
+        persist(store.update_many, changes)
+    
+    redraw_view()
+    update_total()
+    if next(store.pending_rows(), None) is not None:
+        convert_pending()
+
+# ===================== BULK IMPORT =====================
+# Reading, validating and converting a statement runs on a worker thread
+# (see importer.py), then the Tk thread inserts every accepted row with
+# one store.insert_many(): one storage write, one redraw of the page, one
+# total update and one summary instead of a dialog per row.
+def import_expenses():
+    """Import a CSV or OFX file in the background"""
+    global importing
+    if importing or rebasing or opening or loader is not None:
+        messagebox.showwarning("Warning", "Please wait until the current operation finishes")
+        return
+    path = filedialog.askopenfilename(
+        title="Import Expenses",
+        filetypes=[("CSV / OFX statements", "*.csv *.ofx *.qfx *.txt"), ("All files", "*.*")]
+    )
+    if not path:
+        return
+    
+    currencies = set(get_currency_index().names)
+    base = base_currency
+    
+    def rate_pair(day, currency):
+        try:
+            return rates_for(day, currency, base)
+        except RateError:
+            return None  # stays pending, reported by convert_pending()
+    
+    def backfill(days):
+        # Fetch the missing days here first, so the file converts with one snapshot
+        try:
+            history.backfill(days)
+        except RateError:
+            pass  # those rows stay pending, convert_pending() reports them
+        if any(day >= date.today() for day in days):
+            try:
+                rate_cache.get_rates()
+            except RateError:
+                pass
+    
+    def worker():
+        try:
+            result = import_file(path, currencies, base, rate_pair, backfill=backfill)
+            import_results.put((path, result, None))
+        except Exception as e:
+            import_results.put((path, None, e))
+    
+    importing = True
+    status_label.configure(text=f"⏳ Importing {os.path.basename(path)}...", text_color=TEXT_SECONDARY)
+    threading.Thread(target=worker, daemon=True).start()
+    poll_import()
 
-def refresh_rows():
-    """Refresh row styling with alternating colors"""
+def poll_import():
+    """Wait on the Tk thread for the import worker"""
+    try:
+        result = import_results.get_nowait()
+    except queue.Empty:
+        window.after(50, poll_import)
+        return
+    finish_import(*result)
+
+@timed
+def finish_import(path, result, error):
+    """Insert the imported rows as one batch and report what was rejected"""
+    global importing
+    importing = False
+    name = os.path.basename(path)
+    if error is not None:
+        status_label.configure(text="")
+        messagebox.showerror("Import Error", f"Failed to import {name}: {str(error)}")
+        return
+    
+    # Newest rows are on top: the file goes there as one block, in file order
+    persist(undo_log.insert_many, 0, result.expenses)
+    redraw_view()
+    update_total()
+    update_filter_choices()
+    
+    lines = [f"Imported {len(result.expenses):,} expense(s) from {name}"]
+    if result.skipped:
+        lines.append(f"Skipped {result.skipped:,} credit(s)")
+    if result.rejected:
+        report = rejects_file(path)
+        try:
+            write_rejects(report, result.rejected)
+            lines.append(f"Rejected {len(result.rejected):,} line(s), see {os.path.basename(report)}")
+        except OSError:
+            lines.append(f"Rejected {len(result.rejected):,} line(s)")
+        for line, reason, _ in result.rejected[:5]:
+            lines.append(f"• Line {line}: {reason}")
+    messagebox.showinfo("Import", "\n".join(lines))
+    
+    if next(store.pending_rows(), None) is not None:
+        convert_pending()
+
+# ===================== EXPORT =====================
+def export_view():
+    """Export the rows in view (the filter matches, or everything, in view order) to a file"""
+    path = filedialog.asksaveasfilename(
+        title="Export Expenses",
+        defaultextension=".csv",
+        filetypes=[
+            ("CSV", "*.csv"), ("JSON Lines", "*.jsonl"),
+            ("Parquet", "*.parquet"), ("Arrow", "*.arrow")
+        ]
+    )
+    if not path:
+        return
+    
+    # Copy the selected columns now, the worker writes them while the store may change
+    columns = select(store, keys=view_keys)
+    
+    def worker():
+        try:
+            export_results.put((path, export(columns, path), None))
+        except Exception as e:
+            export_results.put((path, 0, e))
+    
+    status_label.configure(text=f"⏳ Exporting to {os.path.basename(path)}...", text_color=TEXT_SECONDARY)
+    threading.Thread(target=worker, daemon=True).start()
+    poll_export()
+
+def poll_export():
+    """Wait on the Tk thread for the export worker"""
+    try:
+        path, count, error = export_results.get_nowait()
+    except queue.Empty:
+        window.after(50, poll_export)
+        return
+    if error is not None:
+        status_label.configure(text="")
+        messagebox.showerror("Export Error", f"Failed to export: {str(error)}")
+        return
+    status_label.configure(text=f"✓ Exported {count:,} expense(s) to {os.path.basename(path)}", text_color=SUCCESS)
+    window.after(3000, lambda: status_label.configure(text=""))
+
+def setup_striping():
+    """Use tksheet's built-in alternate row color when available"""
+    global native_striping
+    # tksheet 7+ paints alternating rows itself, only for the visible rows,
+    # so nothing has to be restyled after inserts, deletes or reloads
+    native_striping = "alternate_color" in getattr(sheet, "ops", {})
+    if native_striping:
+        sheet.set_options(table_bg=BG_PANEL, table_fg=TEXT, alternate_color=BG_INPUT)
+
+@timed
+def refresh_rows(start=0):
+    """Refresh row styling with alternating colors from row start onwards"""
+    if native_striping:
+        return
     rows = sheet.get_total_rows()
-    if rows == 0:
+    if start >= rows:
         return
     
-    # Alternating row colors
-    for i in range(rows):
-        if i % 2 == 0:
-            sheet.highlight_rows([i], bg="#1a1f35", fg=TEXT)
-        else:
-            sheet.highlight_rows([i], bg="#242b42", fg=TEXT)
+    # Alternating row colors, one batched call per color
+    even = start + start % 2
+    odd = start + 1 - start % 2
+    sheet.highlight_rows(rows=range(even, rows, 2), bg=BG_PANEL, fg=TEXT, redraw=False)
+    sheet.highlight_rows(rows=range(odd, rows, 2), bg=BG_INPUT, fg=TEXT)
+
+# ===================== PAGED TABLE VIEW =====================
+# The sheet only holds PAGE_SIZE rows starting at view_offset. The page
+# scrollbar next to it moves that window over the whole store, so memory
+# and redraw cost in the widget stay constant for any ledger size.
+# While a filter or a sort is set the window moves over view_keys instead.
+def view_count():
+    """Rows in the view: the whole store, or the filter matches"""
+    return len(store) if view_keys is None else len(view_keys)
+
+@timed
+def render_page():
+    """Fill the sheet with the rows of the current page"""
+    global view_offset
+    total = view_count()
+    view_offset = max(0, min(view_offset, total - PAGE_SIZE))
+    end = min(view_offset + PAGE_SIZE, total)
+    sheet.set_sheet_data(
+        [store.display_row(to_store_index(row)) for row in range(end - view_offset)],
+        reset_col_positions=False
+    )
+    refresh_rows()
+    update_pager()
+
+def update_pager():
+    """Move the page scrollbar to the current window"""
+    total = view_count()
+    if total == 0:
+        page_scrollbar.set(0, 1)
+        page_label.configure(text="" if filter_keys is None else "No matching expenses")
+        return
+    end = view_offset + sheet.get_total_rows()
+    page_scrollbar.set(view_offset / total, end / total)
+    text = f"Rows {view_offset + 1:,}–{end:,} of {total:,}"
+    if filter_keys is not None:
+        text += f" (filtered from {len(store):,})"
+    page_label.configure(text=text)
+
+def scroll_pages(action, amount, unit=None):
+    """Page scrollbar command: ("moveto", fraction) or ("scroll", n, units/pages)"""
+    global view_offset
+    total = view_count()
+    if action == "moveto":
+        offset = int(float(amount) * total)
+    else:
+        step = PAGE_SIZE if unit == "pages" else SCROLL_STEP
+        offset = view_offset + int(amount) * step
+    offset = max(0, min(offset, total - PAGE_SIZE))
+    if offset != view_offset:
+        view_offset = offset
+        render_page()
+
+def to_store_index(sheet_row):
+    """Store index of a row on the sheet"""
+    if view_keys is None:
+        return view_offset + sheet_row
+    return store.index_of(view_keys[view_offset + sheet_row])
+
+def view_insert(idx):
+    """Show a row just inserted into the store at idx"""
+    global view_offset
+    if view_keys is not None:
+        refilter()
+        return
+    shown = sheet.get_total_rows()
+    if idx < view_offset:
+        view_offset += 1  # keep the same rows on screen
+    elif idx - view_offset <= shown and (idx - view_offset < shown or shown < PAGE_SIZE):
+        sheet.insert_row(store.display_row(idx), idx=idx - view_offset)
+        if shown + 1 > PAGE_SIZE:
+            sheet.delete_row(PAGE_SIZE)  # pushed off the end of the page
+        refresh_rows(idx - view_offset)
+    update_pager()
+
+def view_update(idx):
+    """Redraw a row just updated in the store, if it is on the page"""
+    if view_keys is not None:
+        refilter()  # the row may have started or stopped matching, or moved
+        return
+    row = idx - view_offset
+    if 0 <= row < sheet.get_total_rows():
+        sheet.set_row_data(row, store.display_row(idx))
+
+def view_delete(idx):
+    """Remove a row just deleted from the store at idx"""
+    global view_offset
+    if view_keys is not None:
+        refilter()
+        return
+    shown = sheet.get_total_rows()
+    if idx < view_offset:
+        view_offset -= 1
+    elif idx - view_offset < shown:
+        sheet.delete_row(idx - view_offset)
+        following = view_offset + shown - 1
+        if following < len(store):
+            sheet.insert_row(store.display_row(following), idx=shown - 1)
+        refresh_rows(idx - view_offset)
+    update_pager()
+
+# ===================== FILTERS =====================
+# The filter bar is answered by ExpenseIndex (posting lists per category,
+# payment method and currency plus a sorted date index), which the store
+# keeps up to date on every change, so a filter over a large ledger costs
+# a few list intersections instead of a scan of every row.
+def read_filters():
+    """Filter bar values as ExpenseIndex.search() arguments (raises on bad input)"""
+    filters = {}
+    for name, entry in (("start", filter_from_entry), ("end", filter_to_entry)):
+        text = entry.get().strip()
+        if text:
+            filters[name] = date.fromisoformat(text)
+    
+    category = filter_category_box.get()
+    if category != ALL_CATEGORIES:
+        filters["category"] = category
+    payment = filter_payment_box.get()
+    if payment != ALL_PAYMENTS:
+        filters["payment"] = payment
+    currency = filter_currency_entry.get().strip().upper()
+    if currency:
+        filters["currency"] = currency
+    
+    for name, entry in (("min_amount", filter_min_entry), ("max_amount", filter_max_entry)):
+        text = entry.get().strip().replace(",", "")
+        if text:
+            filters[name] = Decimal(text)
+    
+    text = filter_text_entry.get().strip()
+    if text:
+        filters["text"] = text
+    return filters
+
+def schedule_filters(event=None):
+    """Debounce keystrokes so the filters run once typing pauses"""
+    global filter_job
+    if filter_job is not None:
+        window.after_cancel(filter_job)
+    filter_job = window.after(FILTER_DELAY, apply_filters)
+
+@timed
+def apply_filters(event=None):
+    """Read the filter bar and show the first page of matches"""
+    global filter_job, active_filter, filter_error, view_offset
+    filter_job = None
+    try:
+        filters = read_filters()
+    except (ValueError, InvalidOperation):
+        filter_error = True
+        status_label.configure(text="⚠ Invalid filter: dates are YYYY-MM-DD, amounts are numbers", text_color=WARNING)
+        return "break"
+    
+    if filter_error:
+        filter_error = False
+        status_label.configure(text="")
+    active_filter = filters
+    view_offset = 0
+    refilter()
+    return "break"  # Enter in the filter bar must not add an expense
+
+def refilter():
+    """Run the active filter and sort again after the store changed"""
+    global filter_keys, view_keys
+    filter_keys = expense_index.search(**active_filter) if active_filter else None
+    if sort_column is None:
+        view_keys = filter_keys
+    else:
+        view_keys = sort_index.keys(sort_column, sort_descending, filter_keys)
+    render_page()
 
+def redraw_view():
+    """Redraw the page after a batch change"""
+    if view_keys is not None:
+        refilter()
+    else:
+        render_page()
+
+def clear_filters():
+    """Reset the filter bar and show every row"""
+    for entry in (filter_from_entry, filter_to_entry, filter_currency_entry,
+                  filter_min_entry, filter_max_entry, filter_text_entry):
+        entry.delete(0, tk.END)
+    filter_category_box.set(ALL_CATEGORIES)
+    filter_payment_box.set(ALL_PAYMENTS)
+    apply_filters()
+
+def update_filter_choices():
+    """Offer the categories and payment methods found in the ledger too"""
+    filter_category_box.configure(
+        values=[ALL_CATEGORIES] + sorted(set(categories) | set(expense_index.values("category")))
+    )
+    filter_payment_box.configure(
+        values=[ALL_PAYMENTS] + sorted(set(payments) | set(expense_index.values("payment")))
+    )
+
+@timed
 def update_total():
-    """Update total with proper formatting"""
-    global total_egp
-    total_egp = 0.0
-    
-    for r in range(sheet.get_total_rows()):
-        try:
-            egp_value = sheet.get_cell_data(r, 2)
-            if egp_value:
-                total_egp += float(egp_value)
-        except (ValueError, TypeError):
-            continue
+    """Update total with proper formatting (the store keeps it by deltas)"""
+    global total_base
+    total_base = store.total()
     
     # Format with thousands separator
-    formatted_total = f"{total_egp:,.2f}"
-    total_label.configure(text=f"Total: {formatted_total} EGP")
+    formatted_total = f"{total_base:,.2f}"
+    total_label.configure(text=f"Total: {formatted_total} {base_currency}")
     
     # Update row count
-    row_count_label.configure(text=f"Total Expenses: {sheet.get_total_rows()}")
+    row_count_label.configure(text=f"Total Expenses: {len(store)}")
+    refresh_report()
+
+# ===================== SORTING =====================
+# Clicking a column header sorts the view by that column, a second click
+# reverses it and a third goes back to store order. The order comes from
+# SortIndex (maintained permutations over typed values: cents, dates),
+# so a re-sort is a lookup, not a sort of the rows, and it combines with
+# the active filter.
+@timed
+def sort_by(field):
+    """Sort the view by a column, or step ascending → descending → unsorted"""
+    global sort_column, sort_descending, view_offset
+    if field != sort_column:
+        sort_column, sort_descending = field, False
+    elif not sort_descending:
+        sort_descending = True
+    else:
+        sort_column, sort_descending = None, False
+    sheet.headers(sheet_headers())
+    view_offset = 0
+    refilter()
+
+def header_press(event):
+    """Remember where a press on the column headers started"""
+    global header_click
+    # A press on a column border starts a resize, not a sort
+    header_click = None if getattr(sheet.CH, "rsz_w", None) is not None else event.x
+
+def header_release(event):
+    """Sort by the clicked column header"""
+    global header_click
+    start, header_click = header_click, None
+    if start is None or abs(event.x - start) > 3:
+        return  # a drag, not a click
+    column = sheet.identify_column(event)
+    if column is not None and column < len(COLUMNS):
+        sort_by(COLUMNS[column])
+
+# ===================== REPORTS =====================
+# The report panel reads the rollups (ExpenseRollups), which the store
+# keeps up to date by deltas, so refreshing it after every change is a
+# few dict lookups, not a pass over the ledger.
+def open_report():
+    """Show the report panel, or bring it to the front"""
+    global report_window, report_view, report_sheet
+    if report_window is not None and report_window.winfo_exists():
+        report_window.lift()
+        return
+    
+    report_window = ctk.CTkToplevel(window)
+    report_window.title("Expense Reports")
+    report_window.geometry("820x520")
+    report_window.configure(fg_color=BG_MAIN)
+    
+    report_view = ctk.CTkSegmentedButton(
+        report_window,
+        values=list(REPORT_VIEWS) + [THIS_MONTH],
+        font=("Segoe UI", 12, "bold"),
+        selected_color=ACCENT,
+        selected_hover_color=ACCENT_HOVER,
+        command=lambda value: refresh_report()
+    )
+    report_view.set("By Month")
+    report_view.pack(padx=15, pady=(15, 10))
+    
+    report_sheet = Sheet(
+        report_window,
+        headers=report_headers(),
+        header_bg=BG_INPUT,
+        header_fg=TEXT,
+        index_bg=BG_INPUT,
+        index_fg=TEXT_SECONDARY,
+        top_left_bg=BG_INPUT
+    )
+    report_sheet.enable_bindings("single_select", "column_width_resize", "copy")
+    report_sheet.pack(padx=15, pady=(0, 15), fill="both", expand=True)
+    report_sheet.column_width(column=0, width=200)
+    refresh_report()
+
+def report_headers():
+    return ["Group", "Expenses", f"Total ({base_currency})", "Share", "Pending", "Original Amount"]
+
+@timed
+def refresh_report():
+    """Redraw the report panel from the rollups, if it is open"""
+    if report_window is None or not report_window.winfo_exists():
+        return
+    report_sheet.headers(report_headers())
+    
+    view = report_view.get()
+    if view == THIS_MONTH:
+        rows = rollups.month_summary(month_of(date.today()))
+    else:
+        rows = rollups.report(REPORT_VIEWS[view])
+    
+    total = sum(bucket.total for _, bucket in rows)
+    data = []
+    for value, bucket in rows:
+        share = bucket.total * 100 / total if total else 0
+        data.append([
+            value,
+            f"{bucket.count:,}",
+            f"{bucket.total:,.2f}",
+            f"{share:.1f}%",
+            f"{bucket.pending:,}" if bucket.pending else "",
+            # Only a single currency's amounts add up to something meaningful
+            f"{bucket.amount:,.2f} {value}" if view == "By Currency" else "",
+        ])
+    report_sheet.set_sheet_data(data, reset_col_positions=False)
+
+def persist(change, *args):
+    """Apply a change to the store, which writes it to the storage backend"""
+    try:
+        change(*args)
+        status_label.configure(text="✓ Data saved successfully", text_color=SUCCESS)
+        window.after(3000, lambda: status_label.configure(text=""))
+    except Exception as e:
+        messagebox.showerror("Save Error", f"Failed to save data: {str(e)}")
 
+@timed
 def save_data():
-    """Save data with error handling"""
+    """Compact the storage (journal into a fresh snapshot, or SQLite WAL)"""
+    if opening:
+        return  # the store is still empty, a snapshot now would lose the rows
     try:
-        with open(DATA_FILE, "w", encoding="utf-8") as f:
-            for r in range(sheet.get_total_rows()):
-                row_data = sheet.get_row_data(r)
-                f.write("|".join(map(str, row_data)) + "\n")
+        # Full rescan of the running totals as a consistency check
+        if not store.verify_totals():
+            update_total()
+        storage.compact(wait=True)
         status_label.configure(text="✓ Data saved successfully", text_color=SUCCESS)
         window.after(3000, lambda: status_label.configure(text=""))
     except Exception as e:
         messagebox.showerror("Save Error", f"Failed to save data: {str(e)}")
 
 def load_data():
-    """Load data with validation"""
-    if not os.path.exists(DATA_FILE):
-        return
+    """Recover the rows on a worker thread, then parse them one chunk per Tk cycle"""
+    global opening
+    opening = True
+    status_label.configure(text="⏳ Loading expenses...", text_color=TEXT_SECONDARY)
+    
+    # Reading the snapshot and replaying the journal (or the SQLite query)
+    # runs off the Tk thread, the window stays responsive meanwhile
+    def worker():
+        try:
+            open_results.put((storage.open(), None))
+        except Exception as e:
+            open_results.put((None, e))
     
+    threading.Thread(target=worker, daemon=True).start()
+    poll_open()
+
+def poll_open():
+    """Wait on the Tk thread for the storage to be recovered"""
+    global opening, loader
+    try:
+        rows, error = open_results.get_nowait()
+    except queue.Empty:
+        window.after(20, poll_open)
+        return
+    opening = False
+    if error is not None:
+        messagebox.showerror("Load Error", f"Failed to load data: {str(error)}")
+        return
+    mark_startup("storage opened")
+    loader = store.load_iter(LOAD_CHUNK, rows)
+    load_next_chunk()
+
+@timed
+def load_next_chunk():
+    """Parse the next chunk and append it to the sheet in one call"""
+    global loader
     try:
-        with open(DATA_FILE, "r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    data = line.strip().split("|")
-                    if len(data) == 7:  # Ensure correct number of fields
-                        sheet.insert_row(data)
+        first, done, total = next(loader)
+    except StopIteration:
+        loader = None
         refresh_rows()
         update_total()
+        # Builds the index now, so the first filter keystroke is fast
+        update_filter_choices()
+        if view_keys is not None:
+            refilter()  # a filter or sort set while loading only saw the first chunks
         status_label.configure(text="✓ Data loaded successfully", text_color=SUCCESS)
         window.after(3000, lambda: status_label.configure(text=""))
+        if store.rejected:
+            # They are gone from the file now, show them so they can be re-entered
+            shown = ["|".join(data) for data in store.rejected[:REJECTED_SHOWN]]
+            if len(store.rejected) > REJECTED_SHOWN:
+                shown.append(f"... and {len(store.rejected) - REJECTED_SHOWN} more")
+            messagebox.showwarning(
+                "Unreadable Rows",
+                f"{len(store.rejected)} row(s) could not be read and were removed "
+                "from the ledger:\n\n" + "\n".join(shown)
+            )
+        mark_startup("data loaded")
+        if PROFILE_STARTUP:
+            report_startup()
+        # Rows added while the last fetch was in flight are still pending
+        if next(store.pending_rows(), None) is not None:
+            convert_pending()
+        return
     except Exception as e:
+        loader = None
         messagebox.showerror("Load Error", f"Failed to load data: {str(e)}")
+        return
+    
+    # Only the first page goes into the sheet, the rest waits in the store
+    shown = sheet.get_total_rows()
+    end = min(len(store), view_offset + PAGE_SIZE)
+    if view_keys is None and first - view_offset <= shown and end - view_offset > shown:
+        sheet.insert_rows(rows=[store.display_row(i) for i in range(view_offset + shown, end)], idx="end")
+    update_pager()
+    update_total()
+    status_label.configure(text=f"⏳ Loading expenses... {done * 100 // total}%", text_color=TEXT_SECONDARY)
+    # Give the Tk loop a turn so the window stays responsive
+    window.after(1, load_next_chunk)
 
 # ===================== CURRENCY AUTOCOMPLETE =====================
+def schedule_currency(event):
+    """Debounce keystrokes so the dropdown is rebuilt once typing pauses"""
+    global suggest_job
+    if event.keysym in ("Return", "Escape", "Tab"):
+        return
+    if suggest_job is not None:
+        window.after_cancel(suggest_job)
+    suggest_job = window.after(SUGGEST_DELAY, show_currency, event)
+
+@timed
 def show_currency(event):
     """Show currency suggestions dropdown"""
+    global suggest_job, shown_suggestions
+    suggest_job = None
     items = get_currency_suggestions(currency_entry.get())
-    currency_list.delete(0, tk.END)
 
     if not items:
+        shown_suggestions = []
         currency_list.place_forget()
         return
 
-    for i in items:
-        currency_list.insert(tk.END, i)
+    # Only rebuild the listbox when the suggestions changed
+    if items != shown_suggestions:
+        shown_suggestions = items
+        currency_list.delete(0, tk.END)
+        for code in items:
+            currency_list.insert(tk.END, f"{code} - {get_currency_index().names[code]}")
 
     # Position dropdown below entry
     x = currency_entry.winfo_rootx() - window.winfo_rootx()
@@ -253,7 +1059,7 @@ def select_currency(event=None):
     try:
         selection = currency_list.curselection()
         if selection:
-            value = currency_list.get(selection)
+            value = currency_list.get(selection).split(" - ")[0]
             currency_entry.delete(0, tk.END)
             currency_entry.insert(0, value)
     except:
@@ -290,8 +1096,12 @@ def clear_inputs():
     
     amount_entry.focus_set()
 
+@timed
 def add_expense():
     """Add new expense with validation"""
+    if opening:
+        messagebox.showwarning("Warning", "Please wait until the expenses are loaded")
+        return
     amount = amount_entry.get().strip()
     currency = currency_entry.get().strip().upper()
     category = category_box.get()
@@ -307,40 +1117,38 @@ def add_expense():
 
     # Convert amount
     try:
-        amount_value = float(amount)
-    except ValueError:
+        amount_value = quantize(amount)
+    except InvalidOperation:
         messagebox.showerror("Error", "Invalid amount format")
         return
 
-    # Calculate EGP equivalent
-    if currency == "EGP":
-        egp_value = amount_value
-    else:
-        rates = fetch_rates(currency)
-        if rates[0] is None or rates[1] is None:
-            return  # Error already shown in fetch_rates
-        
-        usd_rate, egp_rate = rates
-        egp_value = round((amount_value / usd_rate) * egp_rate, 2)
+    # Calculate base currency equivalent (None = pending until rates arrive)
+    try:
+        base_value = convert_to_base(amount_value, currency, date.fromisoformat(exp_date))
+    except RateError as e:
+        messagebox.showerror("Error", str(e))
+        return
 
-    # Add to sheet
-    sheet.insert_row([
-        f"{amount_value:.2f}",
+    # Add to store, then show it in the sheet
+    expense = Expense(
+        amount_value,
         currency,
-        f"{egp_value:.2f}",
+        base_value,
         category,
         payment,
-        exp_date,
-        due_date
-    ], idx=0)
+        date.fromisoformat(exp_date),
+        date.fromisoformat(due_date)
+    )
+    persist(undo_log.insert, 0, expense)
+    get_currency_index().note_used(currency)
+    view_insert(0)
     
-    refresh_rows()
     update_total()
-    save_data()
     clear_inputs()
     
     messagebox.showinfo("Success", "Expense added successfully!")
 
+@timed
 def update_expense():
     """Update selected expense"""
     global selected_row
@@ -363,46 +1171,47 @@ def update_expense():
         return
 
     try:
-        amount_value = float(amount)
-    except ValueError:
+        amount_value = quantize(amount)
+    except InvalidOperation:
         messagebox.showerror("Error", "Invalid amount format")
         return
 
-    # Calculate EGP equivalent
-    if currency == "EGP":
-        egp_value = amount_value
-    else:
-        rates = fetch_rates(currency)
-        if rates[0] is None or rates[1] is None:
-            return
-        
-        usd_rate, egp_rate = rates
-        egp_value = round((amount_value / usd_rate) * egp_rate, 2)
+    # Calculate base currency equivalent (None = pending until rates arrive)
+    try:
+        base_value = convert_to_base(amount_value, currency, date.fromisoformat(exp_date))
+    except RateError as e:
+        messagebox.showerror("Error", str(e))
+        return
 
     # Update row
-    sheet.set_row_data(selected_row, [
-        f"{amount_value:.2f}",
+    expense = Expense(
+        amount_value,
         currency,
-        f"{egp_value:.2f}",
+        base_value,
         category,
         payment,
-        exp_date,
-        due_date
-    ])
+        date.fromisoformat(exp_date),
+        date.fromisoformat(due_date)
+    )
+    persist(undo_log.update, selected_row, expense)
+    get_currency_index().note_used(currency)
+    view_update(selected_row)
     
-    refresh_rows()
     update_total()
-    save_data()
     clear_inputs()
     
     messagebox.showinfo("Success", "Expense updated successfully!")
 
+@timed
 def delete_row():
     """Delete selected row with confirmation"""
     selection = sheet.get_currently_selected()
     if not selection or selection[0] is None:
         messagebox.showwarning("Warning", "Please select an expense to delete")
         return
+    if len(selected_rows()) > 1:
+        bulk_delete()
+        return
     
     # Confirm deletion
     result = messagebox.askyesno(
@@ -412,13 +1221,122 @@ def delete_row():
     )
     
     if result:
-        sheet.delete_row(selection[0])
-        refresh_rows()
+        idx = to_store_index(selection[0])
+        persist(undo_log.delete, idx)
+        view_delete(idx)
         update_total()
-        save_data()
         clear_inputs()
         messagebox.showinfo("Success", "Expense deleted successfully!")
 
+# ===================== BULK EDITS =====================
+# Rows picked with Ctrl+click or a drag over the row numbers
+# are changed as one batch: one store call (one journal write or one
+# SQLite transaction), then a single page redraw and total update.
+def selected_rows():
+    """Store indices of every selected row on the page, in order"""
+    rows = set(sheet.get_selected_rows(get_cells_as_rows=True))
+    selection = sheet.get_currently_selected()
+    if selection and selection[0] is not None:
+        rows.add(selection[0])
+    return sorted(to_store_index(row) for row in rows)
+
+def finish_bulk(message):
+    """Redraw once after a batch change"""
+    redraw_view()
+    update_total()
+    clear_inputs()
+    status_label.configure(text=message, text_color=SUCCESS)
+    window.after(3000, lambda: status_label.configure(text=""))
+
+@timed
+def bulk_delete():
+    """Delete every selected row in one batch"""
+    indices = selected_rows()
+    if not indices:
+        messagebox.showwarning("Warning", "Please select the expenses to delete")
+        return
+    if not messagebox.askyesno(
+        "Confirm Delete",
+        f"Are you sure you want to delete {len(indices)} expenses?",
+        icon='warning'
+    ):
+        return
+    persist(undo_log.delete_many, indices)
+    finish_bulk(f"✓ Deleted {len(indices)} expenses")
+
+@timed
+def bulk_set(field, value):
+    """Set the category or payment method of every selected row in one batch"""
+    indices = selected_rows()
+    if not indices:
+        messagebox.showwarning("Warning", "Please select the expenses to change")
+        return
+    items = [(idx, store.row(idx)._replace(**{field: value})) for idx in indices]
+    persist(undo_log.update_many, items)
+    finish_bulk(f"✓ Updated {len(indices)} expenses")
+
+@timed
+def bulk_reconvert():
+    """Convert the selected rows again with the rates of their dates, in one batch"""
+    indices = selected_rows()
+    if not indices:
+        messagebox.showwarning("Warning", "Please select the expenses to re-convert")
+        return
+    
+    waiting = set()
+    def rate_pair(day, currency):
+        try:
+            rates = rates_for(day, currency)
+        except RateError:
+            rates = None
+        if rates is None:
+            waiting.add(day)
+        return rates
+    
+    expenses = [store.row(idx) for idx in indices]
+    converted = convert_column(((e.amount, e.currency, e.date) for e in expenses), base_currency, rate_pair)
+    persist(undo_log.update_many, [
+        (idx, expense._replace(converted=value))
+        for idx, expense, value in zip(indices, expenses, converted)
+    ])
+    finish_bulk(f"✓ Re-converted {len(indices)} expenses")
+    if waiting:
+        fetch_rates(waiting)  # the rows without rates stay pending until then
+
+# ===================== UNDO / REDO =====================
+# Adds, edits, deletes, bulk edits and imports go through undo_log
+# (undo.py), which keeps per-row diffs of the last UNDO_DEPTH changes and
+# replays them through the store's batch calls.
+@timed
+def undo_change():
+    """Revert the last change (Ctrl+Z)"""
+    step_history(undo_log.undo, "↶ Undone", "Nothing to undo")
+
+@timed
+def redo_change():
+    """Apply the last undone change again (Ctrl+Y)"""
+    step_history(undo_log.redo, "↷ Redone", "Nothing to redo")
+
+def step_history(action, done, nothing):
+    if rebasing:
+        return  # the re-conversion matches rows by position and value
+    try:
+        command = action()
+    except Exception as e:
+        messagebox.showerror("Save Error", f"Failed to save data: {str(e)}")
+        redraw_view()
+        update_total()
+        return
+    if command is None:
+        status_label.configure(text=nothing, text_color=TEXT_SECONDARY)
+        window.after(3000, lambda: status_label.configure(text=""))
+        return
+    
+    finish_bulk(f"{done}: {command.describe()}")
+    update_filter_choices()
+    if next(store.pending_rows(), None) is not None:
+        convert_pending()
+
 def select_row(event):
     """Select row for editing"""
     global selected_row, is_editing
@@ -427,24 +1345,24 @@ def select_row(event):
     if not selection or selection[0] is None:
         return
     
-    selected_row = selection[0]
+    selected_row = to_store_index(selection[0])
     is_editing = True
     
     try:
-        data = sheet.get_row_data(selected_row)
+        expense = store.row(selected_row)
         
         # Populate fields
         amount_entry.delete(0, tk.END)
-        amount_entry.insert(0, data[0])
+        amount_entry.insert(0, f"{expense.amount:.2f}")
         
         currency_entry.delete(0, tk.END)
-        currency_entry.insert(0, data[1])
+        currency_entry.insert(0, expense.currency)
         
-        category_box.set(data[3])
-        payment_box.set(data[4])
+        category_box.set(expense.category)
+        payment_box.set(expense.payment)
         
-        date_entry.set_date(data[5])
-        due_entry.set_date(data[6])
+        date_entry.set_date(expense.date)
+        due_entry.set_date(expense.due_date)
         
         # Update button states
         add_btn.configure(text="Add New")
@@ -455,7 +1373,78 @@ def select_row(event):
         messagebox.showerror("Error", f"Failed to load expense: {str(e)}")
         clear_inputs()
 
+def mark_startup(stage):
+    """Record a startup checkpoint for --profile-startup"""
+    startup_marks.append((stage, time.perf_counter()))
+
+def show_latency():
+    """Show the last timed operation next to the status line"""
+    global latency_seen
+    latest = instrument.latest()
+    if latest is not None and latest[0] != latency_seen:
+        latency_seen, name, ms = latest
+        p95 = instrument.histogram(name).percentile(95)
+        latency_label.configure(
+            text=f"⏱ {name} {ms:.1f} ms (p95 {p95:.1f})",
+            text_color=WARNING if ms > SLOW_MS else TEXT_SECONDARY
+        )
+    window.after(LATENCY_POLL, show_latency)
+
+def report_startup():
+    """Print the startup profile and append it to the startup log"""
+    lines = [f"Startup profile ({datetime.now():%Y-%m-%d %H:%M:%S})"]
+    previous = STARTUP_T0
+    for stage, moment in startup_marks:
+        lines.append(
+            f"  {stage:<14} +{(moment - previous) * 1000:8.1f} ms"
+            f"   (at {(moment - STARTUP_T0) * 1000:8.1f} ms)"
+        )
+        previous = moment
+    
+    import_ms = (STARTUP_IMPORTS - STARTUP_T0) * 1000
+    if import_ms > IMPORT_BUDGET_MS:
+        lines.append(f"  ⚠ imports took {import_ms:.1f} ms, budget is {IMPORT_BUDGET_MS} ms")
+    
+    report = "\n".join(lines)
+    print(report)
+    try:
+        with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+            f.write(report + "\n")
+    except OSError:
+        pass
+
+def startup():
+    """Paint the window first, then load the data"""
+    window.update_idletasks()
+    mark_startup("first paint")
+    load_data()
+
+def on_close():
+    """Flush the storage before quitting"""
+    try:
+        storage.close()
+    finally:
+        try:
+            instrument.dump(PERF_LOG)
+        except OSError:
+            pass
+        window.destroy()
+
 # ===================== UI CONSTRUCTION =====================
+storage = open_storage(DATA_FILE, DB_FILE)
+store = ExpenseStore(storage)
+expense_index = ExpenseIndex(store)
+sort_index = SortIndex(store)
+rollups = ExpenseRollups(store)
+undo_log = UndoLog(store, UNDO_DEPTH)
+rate_cache = RateCache(cache_file=RATES_FILE)
+history = HistoricalRates(db_file=HISTORY_FILE)
+rate_results = queue.Queue()
+rebase_results = queue.Queue()
+open_results = queue.Queue()
+import_results = queue.Queue()
+export_results = queue.Queue()
+
 window = ctk.CTk()
 window.title("Expenses Tracker - Professional Edition")
 window.geometry("1300x850")
@@ -484,6 +1473,14 @@ status_label = ctk.CTkLabel(
 )
 status_label.pack(side="right", padx=20)
 
+latency_label = ctk.CTkLabel(
+    header_frame,
+    text="",
+    font=("Segoe UI", 11),
+    text_color=TEXT_SECONDARY
+)
+latency_label.pack(side="right", padx=(20, 0))
+
 # ===== INPUT PANEL =====
 input_panel = ctk.CTkFrame(
     window,
@@ -610,7 +1607,7 @@ currency_list = tk.Listbox(
 currency_list.bind("<<ListboxSelect>>", select_currency)
 currency_list.bind("<Return>", select_currency)
 currency_list.bind("<Escape>", hide_currency_list)
-currency_entry.bind("<KeyRelease>", show_currency)
+currency_entry.bind("<KeyRelease>", schedule_currency)
 currency_entry.bind("<FocusOut>", lambda e: window.after(200, hide_currency_list, None))
 
 # ===== BUTTONS =====
@@ -667,13 +1664,193 @@ cancel_btn = ctk.CTkButton(
 )
 cancel_btn.grid(row=0, column=3, padx=8)
 
+report_btn = ctk.CTkButton(
+    buttons_frame,
+    text="📊 Reports",
+    width=160,
+    height=38,
+    font=("Segoe UI", 13, "bold"),
+    fg_color="#6366f1",
+    hover_color="#4f46e5",
+    command=open_report
+)
+report_btn.grid(row=0, column=4, padx=8)
+
+import_btn = ctk.CTkButton(
+    buttons_frame,
+    text="📥 Import",
+    width=160,
+    height=38,
+    font=("Segoe UI", 13, "bold"),
+    fg_color="#0d9488",
+    hover_color="#0f766e",
+    command=import_expenses
+)
+import_btn.grid(row=0, column=5, padx=8)
+
+# Bulk edits of the selected rows (Ctrl+click or drag to select several)
+bulk_frame = ctk.CTkFrame(buttons_frame, fg_color="transparent")
+bulk_frame.grid(row=1, column=0, columnspan=6, pady=(10, 0))
+
+ctk.CTkLabel(bulk_frame, text="Selected rows:", font=("Segoe UI", 12), text_color=TEXT_SECONDARY).pack(side="left", padx=(0, 8))
+
+def bulk_choice(box, placeholder, field, value):
+    box.set(placeholder)
+    bulk_set(field, value)
+
+bulk_category_box = ctk.CTkComboBox(
+    bulk_frame,
+    values=categories,
+    width=190,
+    font=("Segoe UI", 11),
+    fg_color=BG_INPUT,
+    border_color="#334155",
+    button_color=ACCENT,
+    button_hover_color=ACCENT_HOVER,
+    state="readonly",
+    command=lambda value: bulk_choice(bulk_category_box, BULK_CATEGORY, "category", value)
+)
+bulk_category_box.set(BULK_CATEGORY)
+bulk_category_box.pack(side="left", padx=4)
+
+bulk_payment_box = ctk.CTkComboBox(
+    bulk_frame,
+    values=payments,
+    width=190,
+    font=("Segoe UI", 11),
+    fg_color=BG_INPUT,
+    border_color="#334155",
+    button_color=ACCENT,
+    button_hover_color=ACCENT_HOVER,
+    state="readonly",
+    command=lambda value: bulk_choice(bulk_payment_box, BULK_PAYMENT, "payment", value)
+)
+bulk_payment_box.set(BULK_PAYMENT)
+bulk_payment_box.pack(side="left", padx=4)
+
+reconvert_btn = ctk.CTkButton(
+    bulk_frame,
+    text="🔄 Re-convert",
+    width=130,
+    font=("Segoe UI", 11, "bold"),
+    fg_color="#475569",
+    hover_color="#64748b",
+    command=bulk_reconvert
+)
+reconvert_btn.pack(side="left", padx=4)
+
+undo_btn = ctk.CTkButton(
+    bulk_frame,
+    text="↶ Undo",
+    width=90,
+    font=("Segoe UI", 11, "bold"),
+    fg_color="#475569",
+    hover_color="#64748b",
+    command=undo_change
+)
+undo_btn.pack(side="left", padx=(20, 4))
+
+redo_btn = ctk.CTkButton(
+    bulk_frame,
+    text="↷ Redo",
+    width=90,
+    font=("Segoe UI", 11, "bold"),
+    fg_color="#475569",
+    hover_color="#64748b",
+    command=redo_change
+)
+redo_btn.pack(side="left", padx=4)
+
+# ===== FILTER BAR =====
+filter_panel = ctk.CTkFrame(window, fg_color=BG_PANEL, corner_radius=12)
+filter_panel.pack(padx=20, pady=(0, 10), fill="x")
+
+filter_row = ctk.CTkFrame(filter_panel, fg_color="transparent")
+filter_row.pack(pady=10, padx=15, fill="x")
+
+ctk.CTkLabel(filter_row, text="🔎 Filter", font=("Segoe UI", 12, "bold"), text_color=ACCENT).pack(side="left", padx=(0, 10))
+
+def filter_entry(placeholder, width):
+    entry = ctk.CTkEntry(
+        filter_row,
+        width=width,
+        placeholder_text=placeholder,
+        font=("Segoe UI", 11),
+        fg_color=BG_INPUT,
+        border_color="#334155"
+    )
+    entry.pack(side="left", padx=4)
+    entry.bind("<KeyRelease>", schedule_filters)
+    entry.bind("<Return>", apply_filters)
+    return entry
+
+filter_from_entry = filter_entry("From YYYY-MM-DD", 120)
+filter_to_entry = filter_entry("To YYYY-MM-DD", 120)
+
+filter_category_box = ctk.CTkComboBox(
+    filter_row,
+    values=[ALL_CATEGORIES] + categories,
+    width=170,
+    font=("Segoe UI", 11),
+    fg_color=BG_INPUT,
+    border_color="#334155",
+    button_color=ACCENT,
+    button_hover_color=ACCENT_HOVER,
+    state="readonly",
+    command=lambda value: apply_filters()
+)
+filter_category_box.set(ALL_CATEGORIES)
+filter_category_box.pack(side="left", padx=4)
+
+filter_payment_box = ctk.CTkComboBox(
+    filter_row,
+    values=[ALL_PAYMENTS] + payments,
+    width=150,
+    font=("Segoe UI", 11),
+    fg_color=BG_INPUT,
+    border_color="#334155",
+    button_color=ACCENT,
+    button_hover_color=ACCENT_HOVER,
+    state="readonly",
+    command=lambda value: apply_filters()
+)
+filter_payment_box.set(ALL_PAYMENTS)
+filter_payment_box.pack(side="left", padx=4)
+
+filter_currency_entry = filter_entry("Currency", 80)
+filter_min_entry = filter_entry("Min amount", 95)
+filter_max_entry = filter_entry("Max amount", 95)
+filter_text_entry = filter_entry("Search...", 140)
+
+clear_filters_btn = ctk.CTkButton(
+    filter_row,
+    text="Clear Filters",
+    width=110,
+    font=("Segoe UI", 11, "bold"),
+    fg_color="#475569",
+    hover_color="#64748b",
+    command=clear_filters
+)
+clear_filters_btn.pack(side="right", padx=(4, 0))
+
+export_btn = ctk.CTkButton(
+    filter_row,
+    text="📤 Export",
+    width=100,
+    font=("Segoe UI", 11, "bold"),
+    fg_color="#0d9488",
+    hover_color="#0f766e",
+    command=export_view
+)
+export_btn.pack(side="right", padx=4)
+
 # ===== DATA TABLE =====
 sheet_frame = ctk.CTkFrame(window, fg_color=BG_PANEL, corner_radius=12)
 sheet_frame.pack(padx=20, pady=(0, 10), fill="both", expand=True)
 
 sheet = Sheet(
     sheet_frame,
-    headers=["Amount", "Currency", "Amount (EGP)", "Category", "Payment Method", "Date", "Due Date"],
+    headers=sheet_headers(),
     height=380,
     width=1220,
     header_bg=BG_INPUT,
@@ -682,9 +1859,18 @@ sheet = Sheet(
     index_fg=TEXT_SECONDARY,
     top_left_bg=BG_INPUT
 )
+page_scrollbar = ctk.CTkScrollbar(sheet_frame, orientation="vertical", command=scroll_pages)
+page_scrollbar.pack(side="right", fill="y", padx=(0, 10), pady=15)
 sheet.pack(padx=15, pady=15, fill="both", expand=True)
-sheet.enable_bindings()
+# The sheet is a read-only view of the store, edits go through the form
+setup_striping()
+sheet.enable_bindings(
+    "single_select", "row_select", "drag_select", "ctrl_select", "arrowkeys",
+    "column_width_resize", "double_click_column_resize", "copy"
+)
 sheet.bind("<<SheetSelect>>", select_row)
+sheet.CH.bind("<ButtonPress-1>", header_press, add="+")
+sheet.CH.bind("<ButtonRelease-1>", header_release, add="+")
 
 # Set column widths
 sheet.column_width(column=0, width=100)
@@ -707,23 +1893,60 @@ row_count_label = ctk.CTkLabel(
 )
 row_count_label.pack(side="left", padx=20)
 
+page_label = ctk.CTkLabel(
+    footer_frame,
+    text="",
+    font=("Segoe UI", 12),
+    text_color=TEXT_SECONDARY
+)
+page_label.pack(side="left", padx=20)
+
 total_label = ctk.CTkLabel(
     footer_frame,
-    text="Total: 0.00 EGP",
+    text=f"Total: 0.00 {base_currency}",
     font=("Segoe UI", 20, "bold"),
     text_color=SUCCESS
 )
 total_label.pack(side="right", padx=20)
 
+base_box = ctk.CTkComboBox(
+    footer_frame,
+    values=BASE_CHOICES,
+    width=90,
+    font=("Segoe UI", 12),
+    fg_color=BG_INPUT,
+    border_color="#334155",
+    button_color=ACCENT,
+    button_hover_color=ACCENT_HOVER,
+    command=change_base_currency
+)
+base_box.set(base_currency)
+base_box.pack(side="right")
+base_box.bind("<Return>", lambda e: (change_base_currency(), "break")[1])
+ctk.CTkLabel(footer_frame, text="Base currency", font=("Segoe UI", 12), text_color=TEXT_SECONDARY).pack(side="right", padx=(0, 8))
+
 # ===== KEYBOARD SHORTCUTS =====
 window.bind("<Control-n>", lambda e: clear_inputs())
 window.bind("<Control-s>", lambda e: save_data())
 window.bind("<Return>", lambda e: add_expense() if not is_editing else update_expense())
 window.bind("<Escape>", lambda e: clear_inputs())
 window.bind("<Delete>", lambda e: delete_row())
+window.bind("<Control-Next>", lambda e: scroll_pages("scroll", 1, "pages"))
+window.bind("<Control-Prior>", lambda e: scroll_pages("scroll", -1, "pages"))
+window.bind("<Control-f>", lambda e: filter_text_entry.focus_set())
+window.bind("<Control-r>", lambda e: open_report())
+window.bind("<Control-i>", lambda e: import_expenses())
+window.bind("<Control-e>", lambda e: export_view())
+window.bind("<Control-z>", lambda e: undo_change())
+window.bind("<Control-y>", lambda e: redo_change())
+window.bind("<Control-Z>", lambda e: redo_change())
+
+window.protocol("WM_DELETE_WINDOW", on_close)
 
 # ===== INITIALIZE =====
-load_data()
+mark_startup("ui built")
+window.after(0, startup)
+window.after(LATENCY_POLL, show_latency)
 amount_entry.focus_set()
 
 window.mainloop()
\ No newline at end of file
@@ -0,0 +1,165 @@
+# ===================== ANALYTICS =====================
+# NumPy column arrays • Vectorized re-pricing • Group sums and percentiles
+# -----------------------------------------------------
+#
+# LedgerArrays copies the store into flat NumPy arrays once: amounts in
+# integer cents, currencies / categories / payment methods as small
+# integer codes (plus the list of names), and dates as day ordinals.
+# Re-pricing every row into another currency is then one gather of a
+# per-currency factor and one multiply, group sums are np.bincount and
+# percentiles are np.nanpercentile, with no Python loop over the rows.
+#
+# The results are floats rounded to cents, meant for analysis. The ledger
+# itself keeps exact Decimal amounts (see expense_store.py).
+#
+# NumPy is optional: only this module needs it (pip install numpy).
+
+import argparse
+import time
+from datetime import date
+
+import numpy as np
+
+from rates import RateError
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+DIMENSIONS = ("category", "payment", "currency", "month")
+
+
+def encode(values):
+    """Integer codes for a column of strings, plus the names of the codes"""
+    codes = {}
+    array = np.fromiter((codes.setdefault(v, len(codes)) for v in values), np.int32, len(values))
+    return array, list(codes)
+
+
+class LedgerArrays:
+    """Column arrays of a snapshot of an ExpenseStore"""
+
+    def __init__(self, store):
+        columns = store.columns
+        n = len(store)
+
+        # The store keeps amounts in integer cents already
+        self.amount_cents = np.fromiter(columns["amount"], np.int64, n)
+        # Pending conversions are NaN
+        self.converted = np.fromiter(
+            (np.nan if c is None else c for c in columns["converted"]), np.float64, n
+        ) / 100
+        self.currency, self.currency_names = encode(columns["currency"])
+        self.category, self.category_names = encode(columns["category"])
+        self.payment, self.payment_names = encode(columns["payment"])
+        self.day = np.fromiter(map(date.toordinal, columns["date"]), np.int32, n)
+
+        self._month = None
+
+    def __len__(self):
+        return len(self.amount_cents)
+
+    # ===================== CONVERSION =====================
+    def reprice(self, rates, target="USD"):
+        """Every original amount in target currency, from a USD-based rates table
+
+        Rows whose currency has no rate come out as NaN.
+        """
+        if target not in rates:
+            raise RateError(f"Currency {target} not found in rates")
+        usd = np.array(
+            [float(rates[code]) if rates.get(code) is not None else np.nan
+             for code in self.currency_names],
+            dtype=np.float64,
+        )
+        factor = float(rates[target]) / usd
+        cents = self.amount_cents * factor[self.currency]
+        return np.floor(cents + 0.5) / 100  # half-up, like quantize()
+
+    def missing_rates(self, rates):
+        """Currencies of the ledger that the rates table does not cover"""
+        return [code for code in self.currency_names if rates.get(code) is None]
+
+    # ===================== GROUPING =====================
+    def months(self):
+        """Month code of every row and the "YYYY-MM" names of the codes
+
+        Codes count months from the first one, so months without expenses
+        in between get a name (and a zero sum) too.
+        """
+        if self._month is None:
+            if not len(self.day):
+                self._month = np.zeros(0, np.int32), []
+                return self._month
+            # Month of each day in the ledger's span, then one gather for the rows
+            first_day = int(self.day.min())
+            span = np.arange(first_day, int(self.day.max()) + 1) - EPOCH_ORDINAL
+            span_month = span.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+            first = int(span_month[0])
+            names = np.arange(first, int(span_month[-1]) + 1).astype("datetime64[M]")
+            codes = (span_month - first).astype(np.int32)[self.day - first_day]
+            self._month = codes, [str(m) for m in names]
+        return self._month
+
+    def groups(self, dimension):
+        """Codes and names for one of DIMENSIONS"""
+        if dimension == "month":
+            return self.months()
+        if dimension not in DIMENSIONS:
+            raise ValueError(f"Unknown dimension {dimension!r}")
+        return getattr(self, dimension), getattr(self, f"{dimension}_names")
+
+    def group_sum(self, dimension, values=None):
+        """{group: sum of values} (default: the converted column), NaN rows skipped"""
+        values = self.converted if values is None else values
+        codes, names = self.groups(dimension)
+        known = ~np.isnan(values)
+        sums = np.bincount(codes[known], weights=values[known], minlength=len(names))
+        return {name: round(float(total), 2) for name, total in zip(names, sums)}
+
+    def group_count(self, dimension):
+        codes, names = self.groups(dimension)
+        counts = np.bincount(codes, minlength=len(names))
+        return dict(zip(names, counts.tolist()))
+
+    def percentiles(self, values=None, q=(50, 90, 99)):
+        """{q: percentile of values} (default: the converted column), NaN rows skipped"""
+        values = self.converted if values is None else values
+        if not np.any(~np.isnan(values)):
+            return {p: None for p in q}
+        return dict(zip(q, (round(float(v), 2) for v in np.nanpercentile(values, q))))
+
+
+# ===================== SUMMARY COMMAND =====================
+def main():
+    from expense_store import ExpenseStore
+    from rates import RateCache
+    from storage import open_storage
+
+    parser = argparse.ArgumentParser(description="Ledger analytics")
+    parser.add_argument("--data", default="expenses.txt", help="expenses file")
+    parser.add_argument("--db", default="expenses.sqlite3", help="expenses database (if migrated)")
+    parser.add_argument("--to", default="USD", help="currency to re-price the ledger into")
+    parser.add_argument("--by", default="category", choices=DIMENSIONS, help="grouping")
+    args = parser.parse_args()
+
+    store = ExpenseStore(open_storage(args.data, args.db))
+    store.load(readonly=True)
+    arrays = LedgerArrays(store)
+
+    rates = RateCache().get_rates()
+    started = time.perf_counter()
+    repriced = arrays.reprice(rates, args.to.upper())
+    elapsed = (time.perf_counter() - started) * 1000
+
+    print(f"Re-priced {len(arrays):,} expense(s) into {args.to.upper()} in {elapsed:.1f} ms")
+    missing = arrays.missing_rates(rates)
+    if missing:
+        print(f"No rate for: {', '.join(missing)}")
+    print(f"Total: {np.nansum(repriced):,.2f} {args.to.upper()}")
+    counts = arrays.group_count(args.by)
+    for name, total in sorted(arrays.group_sum(args.by, repriced).items(), key=lambda i: -i[1]):
+        print(f"  {name:<24} {counts[name]:>8,}  {total:>16,.2f}")
+    for q, value in arrays.percentiles(repriced).items():
+        print(f"  p{q:<3} {'-' if value is None else f'{value:,.2f}'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,707 @@
+# ===================== BENCHMARKS =====================
+# Synthetic ledgers • Hot paths • Results tracked between commits
+# ------------------------------------------------------
+#
+# Times the paths that grow with the ledger on synthetic ledgers of 1k,
+# 100k and 1M rows: loading and saving (text journal and SQLite), the
+# total and report rescans, formatting one table page, re-sorting the
+# table by a column and converting every row. Currency autocomplete and
+# the rate fetches are timed once. The CurrencyFreaks API is replaced by
+# a local HTTP stub, so the fetch timings include real requests / JSON /
+# disk work but no network.
+#
+# Before timing anything, round-trip checks replay a seeded series of
+# random inserts, updates, deletes and batches through the text journal,
+# SQLite and the undo log, reload the ledger and compare it with a plain
+# list of the same changes. A store that loses or misplaces rows fails
+# the run with exit code 1, its timings would mean nothing.
+#
+# Every run is appended to benchmark_history.jsonl with the commit it ran
+# on, and compared with the previous run from the same machine. Cases more
+# than REGRESSION slower are flagged (and make --check exit with 1).
+#
+#     python benchmarks.py                      # every case, 1k and 100k rows
+#     python benchmarks.py --sizes 1k 100k 1m
+#     python benchmarks.py --only load_text total convert
+#     python benchmarks.py --check              # exit 1 on a regression
+#     python benchmarks.py --verify             # only the round-trip checks
+#
+# Nothing here is imported by the app. NumPy is optional (the reprice case
+# is skipped without it), the suggest case needs pycountry and the rate
+# cases need requests, like the app does.
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import rates
+from currency_index import load_currency_index
+from expense_index import ExpenseIndex
+from expense_store import Expense, ExpenseStore, convert_amount, convert_column, format_row
+from journal import ExpenseJournal, JournalLocked
+from rates import HistoricalRates, RateCache
+from rollups import ExpenseRollups
+from sort_index import SortIndex
+from storage import INSERT_SQL, SqliteStorage, migrate, row_to_record
+from undo import UndoLog
+
+HISTORY_FILE = "benchmark_history.jsonl"
+SIZES = {"1k": 1000, "100k": 100000, "1m": 1000000}
+DEFAULT_SIZES = ("1k", "100k")
+REGRESSION = 0.20  # slower than this fraction of the previous run is flagged
+REPEAT = 5  # runs per case, the median is kept (fewer on 1M rows)
+SEED = 2024
+PAGE_SIZE = 500  # rows per table page, as in the GUI
+APPENDS = 200  # single-row changes timed by the append cases
+
+FIRST_DAY = date(2023, 1, 1)
+DAYS = 730
+USD_RATES = {  # also the share of rows in that currency
+    "EGP": ("48.6", 60), "USD": ("1", 12), "EUR": ("0.92", 8), "SAR": ("3.75", 6),
+    "AED": ("3.6725", 4), "GBP": ("0.79", 3), "KWD": ("0.307", 2), "JPY": ("151.4", 2),
+    "TRY": ("32.2", 1), "CHF": ("0.9", 1), "CAD": ("1.36", 1),
+}
+SUGGEST_QUERIES = ("e", "eg", "egp", "u", "us", "dollar", "po", "pound", "riy", "sw", "x", "dinar")
+CATEGORIES = (
+    "Food & Dining", "Transportation", "Utilities", "Entertainment", "Healthcare",
+    "Personal Care", "Education", "Gifts & Donations", "Shopping", "Other",
+)
+PAYMENTS = (
+    "Cash", "Credit Card", "Debit Card", "Mobile Payment", "Bank Transfer", "Check",
+    "Digital Wallet",
+)
+CHECK_TEXT = (  # categories the file formats have to escape
+    "Food & Dining", "Rent|Home", 'Say "hi"', '"quoted', "a|b|c|d|e|f|g", "Café ☕",
+    "Two\nlines", "  padded  ", "",
+)
+CHECK_CHANGES = 400  # random changes per check
+
+
+# ===================== CURRENCYFREAKS STUB =====================
+def stub_rates(day=None):
+    """USD rates table of a day, drifting a little from day to day"""
+    drift = Decimal(1) if day is None else 1 + Decimal(day.toordinal() % 30) / 1000
+    return {code: str(Decimal(rate) * drift) for code, (rate, _) in USD_RATES.items()}
+
+class RatesStub:
+    """Local server answering the latest and historical CurrencyFreaks endpoints"""
+
+    def __init__(self):
+        stub = self
+        self.requests = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                url = urlparse(self.path)
+                day = parse_qs(url.query).get("date", [None])[0]
+                body = json.dumps({
+                    "date": day or date.today().isoformat(),
+                    "base": "USD",
+                    "rates": stub_rates(day and date.fromisoformat(day)),
+                }).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def install(self):
+        """Point rates.py at the stub"""
+        url = f"http://127.0.0.1:{self.server.server_port}/v2.0/rates"
+        rates.RATES_URL = url + "/latest?apikey={api_key}"
+        rates.HISTORY_URL = url + "/historical?apikey={api_key}&date={day}"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+# ===================== SYNTHETIC LEDGERS =====================
+def synthetic_expenses(count, seed=SEED):
+    """count expenses over DAYS days, newest first, converted to EGP"""
+    rng = random.Random(seed)
+    codes = list(USD_RATES)
+    weights = [share for _, share in USD_RATES.values()]
+    usd = {code: Decimal(rate) for code, (rate, _) in USD_RATES.items()}
+    days = sorted((FIRST_DAY + timedelta(rng.randrange(DAYS)) for _ in range(count)), reverse=True)
+
+    expenses = []
+    for day, currency in zip(days, rng.choices(codes, weights, k=count)):
+        amount = Decimal(rng.randrange(100, 2000000)).scaleb(-2)
+        expenses.append(Expense(
+            amount,
+            currency,
+            convert_amount(amount, usd[currency], usd["EGP"]),
+            rng.choice(CATEGORIES),
+            rng.choice(PAYMENTS),
+            day,
+            day + timedelta(rng.randrange(30)),
+        ))
+    return expenses
+
+class Ledger:
+    """Files and a loaded store of one synthetic ledger size"""
+
+    def __init__(self, label, folder):
+        self.label = label
+        self.count = SIZES[label]
+        self.data_file = os.path.join(folder, f"expenses_{label}.txt")
+        self.load_file = os.path.join(folder, f"expenses_{label}_load.txt")
+        self.db_file = os.path.join(folder, f"expenses_{label}.sqlite3")
+
+        # Written in one batch, which goes straight into a snapshot
+        store = ExpenseStore(ExpenseJournal(self.data_file))
+        store.load()
+        store.insert_many(0, synthetic_expenses(self.count))
+        store.storage.close()
+        migrate(self.data_file, self.db_file)
+        # self.store keeps the ledger locked, the load case opens a copy
+        shutil.copyfile(self.data_file, self.load_file)
+
+        self.store = ExpenseStore(ExpenseJournal(self.data_file))
+        self.store.load()
+
+    def close(self):
+        self.store.storage.close(compact=False)
+
+
+# ===================== ROUND-TRIP CHECKS =====================
+# Each check applies the same random changes to a store and to a plain
+# list, then reloads the store from disk and compares. A mismatch raises
+# CheckFailed with the first row that differs.
+class CheckFailed(Exception):
+    pass
+
+def expect_rows(store, expected, what):
+    rows = list(store)
+    if rows == expected:
+        return
+    for idx, (row, want) in enumerate(zip(rows, expected)):
+        if row != want:
+            raise CheckFailed(f"{what}: row {idx} is {row}, expected {want}")
+    raise CheckFailed(f"{what}: {len(rows)} rows, expected {len(expected)}")
+
+def reloaded(storage, expected, what, chunk_size=None):
+    """Open storage in a new store, check it holds expected, return the store"""
+    store = ExpenseStore(storage)
+    for _ in store.load_iter(chunk_size):
+        pass
+    expect_rows(store, expected, what)
+    return store
+
+def random_expense(rng):
+    day = FIRST_DAY + timedelta(rng.randrange(DAYS))
+    amount = Decimal(rng.randrange(-500, 2000000)).scaleb(-2)
+    converted = None if rng.random() < 0.2 else Decimal(rng.randrange(100000)).scaleb(-2)
+    return Expense(
+        amount,
+        rng.choice(list(USD_RATES)),
+        converted,
+        rng.choice(CHECK_TEXT),
+        rng.choice(PAYMENTS + CHECK_TEXT),
+        day,
+        day + timedelta(rng.randrange(30)),
+    )
+
+def random_changes(store, expected, rng, count=CHECK_CHANGES):
+    """Apply count random changes (single rows and batches) to both"""
+    for _ in range(count):
+        op = rng.random()
+        if op < 0.25 or not expected:
+            idx = rng.randrange(len(expected) + 1)
+            expense = random_expense(rng)
+            store.insert(idx, expense)
+            expected.insert(idx, expense)
+        elif op < 0.35:
+            idx = rng.randrange(len(expected) + 1)
+            expenses = [random_expense(rng) for _ in range(rng.randrange(1, 40))]
+            store.insert_many(idx, expenses)
+            expected[idx:idx] = expenses
+        elif op < 0.6:
+            idx = rng.randrange(len(expected))
+            expense = random_expense(rng)
+            store.update(idx, expense)
+            expected[idx] = expense
+        elif op < 0.7:
+            indices = rng.sample(range(len(expected)), min(len(expected), 20))
+            items = [(idx, random_expense(rng)) for idx in indices]
+            store.update_many(items)
+            for idx, expense in items:
+                expected[idx] = expense
+        elif op < 0.9:
+            idx = rng.randrange(len(expected))
+            store.delete(idx)
+            del expected[idx]
+        else:
+            indices = rng.sample(range(len(expected)), rng.randrange(1, min(len(expected), 20) + 1))
+            store.delete_many(indices)
+            for idx in sorted(indices, reverse=True):
+                del expected[idx]
+
+def check_journal(folder, rng):
+    """Text journal: compactions in the background, torn writes, prepend()"""
+    data_file = os.path.join(folder, "check.txt")
+    with open(data_file, "w", encoding="utf-8") as f:
+        f.write("1.00|EGP|1.00|Food|Cash|2024-01-01|2024-01-01\n")
+        f.write("2.00|EGP|2.00|Food|Cash|2024-02-30|2024-03-01\n")  # no such day
+        f.write("x|EGP|3.00|Food|Cash|2024-01-03|2024-01-03\n")
+    first = Expense(Decimal("1.00"), "EGP", Decimal("1.00"), "Food", "Cash",
+                    date(2024, 1, 1), date(2024, 1, 1))
+    expected = [first]
+
+    with open(data_file, "rb") as f:
+        before = f.read()
+    store = ExpenseStore(ExpenseJournal(data_file))
+    store.load(readonly=True)
+    expect_rows(store, expected, "journal, read-only")
+    with open(data_file, "rb") as f:
+        if f.read() != before or os.path.exists(data_file + ".journal"):
+            raise CheckFailed("journal: a read-only load changed the ledger")
+
+    store = reloaded(ExpenseJournal(data_file, compact_every=7), expected, "journal, bad rows")
+    random_changes(store, expected, rng)
+    store.storage.close(compact=False)
+    store = reloaded(ExpenseJournal(data_file, compact_every=7), expected, "journal, replayed")
+    random_changes(store, expected, rng)
+    store.storage.close()
+    store = reloaded(ExpenseJournal(data_file), expected, "journal, compacted", chunk_size=50)
+    store.storage.close(compact=False)
+
+    with open(data_file + ".journal", "a", encoding="utf-8") as f:
+        f.write('{"seq": 99999999, "op": "ins')  # torn write
+    journal = ExpenseJournal(data_file)
+    if journal.prepend(format_row(first)):
+        raise CheckFailed("journal: prepend() wrote after a torn write")
+    store = reloaded(journal, expected, "journal, torn write")
+    store.storage.close(compact=False)
+
+    expense = random_expense(rng)
+    if not ExpenseJournal(data_file).prepend(format_row(expense)):
+        raise CheckFailed("journal: prepend() refused a clean journal")
+    expected.insert(0, expense)
+    store = reloaded(ExpenseJournal(data_file), expected, "journal, prepend")
+
+    # A second writer while the ledger is open (the app and a cron "add")
+    other = ExpenseJournal(data_file)
+    other.lock_wait = 0
+    for write in (lambda: other.prepend(format_row(expense)), other.open, other.compact):
+        try:
+            write()
+        except JournalLocked:
+            continue
+        raise CheckFailed("journal: a second writer got in while the ledger was open")
+    random_changes(store, expected, rng, 20)
+    store.storage.close()
+    reloaded(ExpenseJournal(data_file), expected, "journal, after a locked writer").storage.close()
+
+def check_sqlite(folder, rng):
+    """SQLite: migrated rows, rows SQLite accepted but the loader rejects, prepend()"""
+    data_file = os.path.join(folder, "check_sqlite.txt")
+    db_file = os.path.join(folder, "check.sqlite3")
+    store = ExpenseStore(ExpenseJournal(data_file))
+    store.load()
+    expected = [random_expense(rng) for _ in range(50)]
+    store.insert_many(0, expected)
+    store.storage.close()
+    with open(data_file, "a", encoding="utf-8") as f:
+        f.write("2.00|EGP|2.00|Food|Cash|2024-02-30|2024-03-01\n")
+    migrate(data_file, db_file)
+
+    storage = SqliteStorage(db_file)
+    db = storage.connect()
+    with db:  # written by hand or by an older version, in the middle
+        db.execute(INSERT_SQL, (24.5, *row_to_record(
+            ["3.00", "EGP", "3.00", "Food", "Cash", "2024-13-01", "2024-01-01"]
+        )))
+    store = reloaded(storage, expected, "sqlite, bad rows", chunk_size=7)
+    random_changes(store, expected, rng)
+    store.storage.close()
+    store = reloaded(SqliteStorage(db_file), expected, "sqlite, reopened")
+    random_changes(store, expected, rng)
+    store.storage.close(compact=False)
+
+    expense = random_expense(rng)
+    SqliteStorage(db_file).prepend(format_row(expense))
+    expected.insert(0, expense)
+    store = reloaded(SqliteStorage(db_file), expected, "sqlite, prepend")
+    store.storage.close()
+
+def check_undo(folder, rng):
+    """Undo everything, redo everything, with the indexes following along"""
+    data_file = os.path.join(folder, "check_undo.txt")
+    store = ExpenseStore(ExpenseJournal(data_file, compact_every=11))
+    store.load()
+    index = ExpenseIndex(store)
+    sort = SortIndex(store)
+    rollups = ExpenseRollups(store)
+    index.search()
+    sort.keys("amount")
+    sort.keys("date")
+    rollups.table("month")
+
+    log = UndoLog(store, depth=CHECK_CHANGES + 2)
+    log.insert_many(0, [random_expense(rng) for _ in range(1500)])  # past BATCH_RESET
+    expected = list(store)
+    states = [[], list(expected)]
+    for _ in range(CHECK_CHANGES):
+        random_changes(log, expected, rng, 1)
+        if len(log.done) == len(states):  # an update to the same values logs nothing
+            states.append(list(expected))
+
+    undone = []
+    while log.undo() is not None:
+        undone.append(states.pop())
+        expect_rows(store, states[-1], f"undo, {len(states) - 1} commands left")
+    while undone:
+        log.redo()
+        states.append(undone.pop())
+        expect_rows(store, states[-1], f"redo, {len(undone)} commands left")
+
+    fresh = ExpenseStore()
+    fresh.insert_many(0, list(store))
+    checks = (
+        ("search", index.search(), ExpenseIndex(fresh).search()),
+        ("sort by amount", sort.keys("amount"), SortIndex(fresh).keys("amount")),
+        ("sort by date", sort.keys("date", True), SortIndex(fresh).keys("date", True)),
+        ("rollups", rollups.report("category"), ExpenseRollups(fresh).report("category")),
+    )
+    for name, kept, built in checks:
+        if name != "rollups":  # keys are positions in their own store
+            kept = [store.index_of(key) for key in kept]
+            built = [fresh.index_of(key) for key in built]
+        if kept != built:
+            raise CheckFailed(f"undo: maintained {name} differs from a rebuild")
+    store.verify_totals()
+    store.storage.close()
+    reloaded(ExpenseJournal(data_file), states[-1], "undo, reloaded").storage.close()
+
+CHECKS = {
+    "journal": check_journal,
+    "sqlite": check_sqlite,
+    "undo": check_undo,
+}
+
+def verify():
+    """Run every round-trip check, return the names of the failed ones"""
+    failed = []
+    with tempfile.TemporaryDirectory() as folder:
+        for name, check in CHECKS.items():
+            try:
+                check(folder, random.Random(SEED))
+            except Exception as e:  # a crash while replaying is a failure too
+                message = str(e) if isinstance(e, CheckFailed) else repr(e)
+                print(f"  check {name:<18} FAILED: {message}")
+                failed.append(name)
+            else:
+                print(f"  check {name:<18} ok")
+    return failed
+
+
+# ===================== CASES =====================
+# Each case does its setup, then times the work and returns seconds per
+# operation. Cases with a ledger run once per size, the others once.
+def timed(work, ops=1):
+    start = time.perf_counter()
+    work()
+    return (time.perf_counter() - start) / ops
+
+def case_load_text(ledger, env):
+    def work():
+        store = ExpenseStore(ExpenseJournal(ledger.load_file))
+        store.load()
+        store.storage.close(compact=False)
+    return timed(work)
+
+def case_save_text(ledger, env):
+    return timed(lambda: ledger.store.storage.compact(wait=True))
+
+def case_append_text(ledger, env):
+    store = ledger.store
+    expense = store.row(0)
+
+    def work():
+        for _ in range(APPENDS):
+            store.insert(0, expense)
+            store.delete(0)
+    return timed(work, 2 * APPENDS)
+
+def case_load_sqlite(ledger, env):
+    def work():
+        store = ExpenseStore(SqliteStorage(ledger.db_file))
+        store.load()
+        store.storage.close(compact=False)
+    return timed(work)
+
+def case_append_sqlite(ledger, env):
+    store = ExpenseStore(SqliteStorage(ledger.db_file))
+    store.load()
+    expense = store.row(0)
+
+    def work():
+        for _ in range(APPENDS):
+            store.insert(0, expense)
+            store.delete(0)
+    seconds = timed(work, 2 * APPENDS)
+    store.storage.close(compact=False)
+    return seconds
+
+def case_total(ledger, env):
+    return timed(ledger.store.verify_totals)
+
+def case_total_sqlite(ledger, env):
+    storage = SqliteStorage(ledger.db_file)
+    start = FIRST_DAY + timedelta(DAYS // 2)
+    seconds = timed(lambda: storage.total(start=start, category="Food & Dining"))
+    storage.close(compact=False)
+    return seconds
+
+def case_rollups(ledger, env):
+    rollups = ExpenseRollups(ledger.store)
+    seconds = timed(rollups.build)
+    ledger.store.observers.remove(rollups)
+    return seconds
+
+def case_sort(ledger, env):
+    index = SortIndex(ledger.store)
+    index.keys("amount")  # built on the first click, then kept up to date
+    seconds = timed(lambda: index.keys("amount", descending=True))
+    ledger.store.observers.remove(index)
+    return seconds
+
+def case_page(ledger, env):
+    store = ledger.store
+    first = max(0, len(store) // 2 - PAGE_SIZE // 2)
+    last = min(first + PAGE_SIZE, len(store))
+    return timed(lambda: [store.display_row(i) for i in range(first, last)])
+
+def case_convert(ledger, env):
+    history = env["history"]
+    expenses = list(ledger.store)
+
+    def rate_pair(day, currency):
+        return history.lookup(day, currency, "USD")
+
+    return timed(lambda: convert_column(
+        ((e.amount, e.currency, e.date) for e in expenses), "USD", rate_pair
+    ))
+
+def case_reprice(ledger, env):
+    from analytics import LedgerArrays
+
+    arrays = LedgerArrays(ledger.store)
+    return timed(lambda: arrays.reprice(stub_rates(), "USD"))
+
+def case_suggest(env):
+    # The index the GUI uses: every pycountry currency, read from its cache
+    index = load_currency_index(os.path.join(env["folder"], "currency_index.json"))
+    index.note_used("EGP")
+    index.note_used("USD")
+    return timed(lambda: [index.search(q) for q in SUGGEST_QUERIES], len(SUGGEST_QUERIES))
+
+def case_fetch(env):
+    cache = RateCache(api_key="bench", cache_file=os.path.join(env["folder"], "rates_cache.json"))
+    return timed(cache.fetch)
+
+def case_backfill(env):
+    db_file = os.path.join(env["folder"], "backfill.sqlite3")
+    if os.path.exists(db_file):
+        os.remove(db_file)
+    history = HistoricalRates(api_key="bench", db_file=db_file)
+    days = [FIRST_DAY + timedelta(i) for i in range(30)]
+    seconds = timed(lambda: history.backfill(days), len(days))
+    history.close()
+    return seconds
+
+LEDGER_CASES = {
+    "load_text": case_load_text,
+    "save_text": case_save_text,
+    "append_text": case_append_text,
+    "load_sqlite": case_load_sqlite,
+    "append_sqlite": case_append_sqlite,
+    "total": case_total,
+    "total_sqlite": case_total_sqlite,
+    "rollups": case_rollups,
+    "page": case_page,
+    "sort": case_sort,
+    "convert": case_convert,
+    "reprice": case_reprice,
+}
+CASES = {
+    "suggest": case_suggest,
+    "fetch": case_fetch,
+    "backfill": case_backfill,
+}
+
+
+# ===================== RUNNER =====================
+def run_case(name, case, args, repeat):
+    """Median seconds per operation, None if the case cannot run here"""
+    try:
+        return statistics.median(case(*args) for _ in range(repeat))
+    except ImportError as e:
+        print(f"  {name:<24} skipped ({e.name} is not installed)")
+        return None
+
+def run(sizes, only, repeat):
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        stub = RatesStub()
+        stub.install()
+        env = {"folder": folder}
+        try:
+            for name, case in CASES.items():
+                if only and name not in only:
+                    continue
+                seconds = run_case(name, case, (env,), repeat)
+                if seconds is not None:
+                    results[name] = seconds
+                    print(f"  {name:<24} {format_seconds(seconds)}")
+
+            if any(name in LEDGER_CASES for name in only or LEDGER_CASES):
+                env["history"] = HistoricalRates(
+                    api_key="bench", db_file=os.path.join(folder, "history.sqlite3")
+                )
+                env["history"].backfill(FIRST_DAY + timedelta(i) for i in range(DAYS))
+
+            for label in sizes:
+                cases = [(n, c) for n, c in LEDGER_CASES.items() if not only or n in only]
+                if not cases:
+                    break
+                print(f"  building the {label} ledger...", end="\r", flush=True)
+                ledger = Ledger(label, folder)
+                times = repeat if ledger.count < 1000000 else max(1, repeat // 2)
+                for name, case in cases:
+                    key = f"{name}/{label}"
+                    seconds = run_case(key, case, (ledger, env), times)
+                    if seconds is not None:
+                        results[key] = seconds
+                        print(f"  {key:<24} {format_seconds(seconds)}")
+                ledger.close()
+        finally:
+            if "history" in env:
+                env["history"].close()
+            stub.close()
+    return results
+
+
+# ===================== HISTORY =====================
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:9.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:9.2f} ms"
+    return f"{seconds:9.3f} s "
+
+def git_commit():
+    """Short commit hash, with "+" when the tree has uncommitted changes"""
+    here = os.path.dirname(os.path.abspath(__file__))  # the repo, wherever we run from
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("+" if dirty else "")
+
+def previous_run(history_file, machine):
+    """Latest recorded run from this machine, or None"""
+    latest = None
+    try:
+        with open(history_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("machine") == machine:
+                    latest = entry
+    except OSError:
+        pass
+    return latest
+
+def compare(results, previous):
+    """Print each case against the previous run, return the regressed cases"""
+    if previous is None:
+        print("\nNo earlier run on this machine to compare with.")
+        return []
+    print(f"\nCompared with {previous['commit']} ({previous['date']}):")
+    regressions = []
+    for key, seconds in results.items():
+        before = previous["results"].get(key)
+        if before is None:
+            print(f"  {key:<24} {format_seconds(seconds)}   (new)")
+            continue
+        change = seconds / before - 1
+        flag = ""
+        if change > REGRESSION:
+            flag = "  ⚠ slower"
+            regressions.append(key)
+        elif change < -REGRESSION:
+            flag = "  faster"
+        print(f"  {key:<24} {format_seconds(seconds)}   {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Expenses Tracker hot paths")
+    parser.add_argument("--sizes", nargs="+", choices=SIZES, default=DEFAULT_SIZES,
+                        help="ledger sizes (default: 1k 100k)")
+    parser.add_argument("--only", nargs="+", choices=[*CASES, *LEDGER_CASES], help="cases to run")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="runs per case (median kept)")
+    parser.add_argument("--history", default=HISTORY_FILE, help="results file")
+    parser.add_argument("--no-save", action="store_true", help="don't record this run")
+    parser.add_argument("--check", action="store_true", help="exit with 1 if a case regressed")
+    parser.add_argument("--verify", action="store_true", help="only run the round-trip checks")
+    args = parser.parse_args()
+
+    machine = f"{platform.node()} / Python {platform.python_version()}"
+    commit = git_commit()
+    print(f"Benchmarks on {commit} ({machine})")
+    if verify():
+        print("\nRound-trip checks failed, not timing a store that loses rows.")
+        sys.exit(1)
+    if args.verify:
+        return
+    results = run(args.sizes, args.only, args.repeat)
+
+    regressions = compare(results, previous_run(args.history, machine))
+    if not args.no_save:
+        entry = {
+            "commit": commit,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "machine": machine,
+            "results": results,
+        }
+        with open(args.history, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+    if regressions and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# ===================== CURRENCY INDEX =====================
+# Sorted prefix index of ISO 4217 codes and names • Recently used first
+# ----------------------------------------------------------
+#
+# The codes and names come from pycountry once and are cached in a small
+# JSON file, so later starts don't load the pycountry database at all.
+# Lookups are two bisections over sorted keys plus the k matches, instead
+# of a scan over every currency on each keystroke.
+
+import json
+import os
+from bisect import bisect_left
+
+CURRENCY_FILE = "currency_index.json"
+MAX_RECENT = 10
+
+
+class CurrencyIndex:
+    """Prefix search over currency codes, name words and full names"""
+
+    def __init__(self, currencies):
+        self.names = dict(currencies)  # code -> name
+
+        self._code_keys = sorted(code.lower() for code in self.names)
+        name_keys = set()
+        for code, name in self.names.items():
+            for key in self._name_keys(name):
+                name_keys.add((key, code))
+        name_keys = sorted(name_keys)
+        self._name_keys_sorted = [key for key, _ in name_keys]
+        self._name_codes = [code for _, code in name_keys]
+
+        self.recent = []  # most recently used codes first
+
+    @staticmethod
+    def _name_keys(name):
+        name = name.lower()
+        return {name, *name.split()}
+
+    def __contains__(self, code):
+        return code in self.names
+
+    def note_used(self, code):
+        """Move code to the front of the recently used list"""
+        if code not in self.names:
+            return
+        if code in self.recent:
+            self.recent.remove(code)
+        self.recent.insert(0, code)
+        del self.recent[MAX_RECENT:]
+
+    def _matches(self, code, text):
+        return code.lower().startswith(text) or any(
+            key.startswith(text) for key in self._name_keys(self.names[code])
+        )
+
+    def search(self, text, limit=10):
+        """Codes matching text: recent codes, then code prefixes, then names"""
+        text = text.strip().lower()
+        if not text:
+            return []
+
+        results = [code for code in self.recent if self._matches(code, text)][:limit]
+
+        keys = self._code_keys
+        i = bisect_left(keys, text)
+        while i < len(keys) and len(results) < limit and keys[i].startswith(text):
+            code = keys[i].upper()
+            if code not in results:
+                results.append(code)
+            i += 1
+
+        keys = self._name_keys_sorted
+        i = bisect_left(keys, text)
+        while i < len(keys) and len(results) < limit and keys[i].startswith(text):
+            code = self._name_codes[i]
+            if code not in results:
+                results.append(code)
+            i += 1
+
+        return results
+
+
+def load_currency_index(cache_file=CURRENCY_FILE):
+    """Build the index from the cache file, or from pycountry on first run"""
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return CurrencyIndex(json.load(f))
+    except (OSError, ValueError, TypeError):
+        pass
+
+    import pycountry
+    currencies = sorted((c.alpha_3, c.name) for c in pycountry.currencies)
+    try:
+        tmp_file = cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(currencies, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+    except OSError:
+        pass  # works without the cache, just slower next start
+    return CurrencyIndex(currencies)
@@ -0,0 +1,130 @@
+# ===================== EXPENSE INDEX =====================
+# Secondary indexes for filtering • Posting lists • Sorted date index
+# ---------------------------------------------------------
+#
+# Rows are indexed by their ordering key (see ExpenseStore.keys), so a
+# sorted list of keys is also the rows in display order. Category, payment
+# method and currency each map to a sorted posting list of keys, and the
+# dates are kept as a sorted list of (ordinal, key) pairs for range
+# queries. The index is built on the first search and then kept up to
+# date by the store's row_added / row_removed calls.
+
+import math
+from bisect import bisect_left, bisect_right, insort
+
+FIELDS = ("category", "payment", "currency")
+
+
+class ExpenseIndex:
+    """Posting lists and a date index over an ExpenseStore"""
+
+    def __init__(self, store):
+        self.store = store
+        self.built = False
+        self.postings = {}   # field -> {value: sorted keys}
+        self.dates = []      # sorted (date ordinal, key)
+        store.observers.append(self)
+
+    # ===================== MAINTENANCE =====================
+    def reset(self):
+        """Drop everything, the next search rebuilds"""
+        self.built = False
+        self.postings = {}
+        self.dates = []
+
+    def build(self):
+        columns = self.store.columns
+        keys = self.store.keys
+        self.postings = {}
+        for field in FIELDS:
+            lists = {}
+            for key, value in zip(keys, columns[field]):
+                lists.setdefault(value, []).append(key)  # keys ascend, lists stay sorted
+            self.postings[field] = lists
+        self.dates = sorted(zip(map(lambda d: d.toordinal(), columns["date"]), keys))
+        self.built = True
+
+    def row_added(self, key, expense):
+        if not self.built:
+            return
+        for field in FIELDS:
+            insort(self.postings[field].setdefault(getattr(expense, field), []), key)
+        insort(self.dates, (expense.date.toordinal(), key))
+
+    def row_removed(self, key, expense):
+        if not self.built:
+            return
+        for field in FIELDS:
+            value = getattr(expense, field)
+            keys = self.postings[field][value]
+            del keys[bisect_left(keys, key)]
+            if not keys:
+                del self.postings[field][value]
+        entry = (expense.date.toordinal(), key)
+        del self.dates[bisect_left(self.dates, entry)]
+
+    # ===================== SEARCH =====================
+    def values(self, field):
+        """Distinct values of a field that currently have rows"""
+        if not self.built:
+            self.build()
+        return sorted(self.postings[field])
+
+    def search(self, start=None, end=None, category=None, payment=None, currency=None,
+               min_amount=None, max_amount=None, text=None):
+        """Ordering keys of the matching rows, in display order
+
+        start/end are dates (inclusive), min_amount/max_amount compare the
+        original amount, text matches category, payment method or currency
+        (case-insensitive substring).
+        """
+        if not self.built:
+            self.build()
+
+        candidates = []  # key lists, every one of them must contain a match
+        for field, value in (("category", category), ("payment", payment), ("currency", currency)):
+            if value is not None:
+                candidates.append(self.postings[field].get(value, []))
+
+        if start is not None or end is not None:
+            lo = 0 if start is None else bisect_left(self.dates, (start.toordinal(),))
+            hi = len(self.dates) if end is None else bisect_right(self.dates, (end.toordinal() + 1,))
+            candidates.append(sorted(key for _, key in self.dates[lo:hi]))
+
+        if text:
+            text = text.strip().lower()
+            matches = set()
+            for field in FIELDS:
+                for value, keys in self.postings[field].items():
+                    if text in value.lower():
+                        matches.update(keys)
+            candidates.append(sorted(matches))
+
+        all_keys = self.store.keys
+        if not candidates:
+            result = None  # every row
+        elif len(candidates) == 1:
+            result = candidates[0]
+        else:
+            candidates.sort(key=len)
+            result = sorted(set(candidates[0]).intersection(*candidates[1:]))
+
+        if min_amount is not None or max_amount is not None:
+            # The amount column is in integer cents
+            low = -math.inf if min_amount is None else math.ceil(min_amount * 100)
+            high = math.inf if max_amount is None else math.floor(max_amount * 100)
+            amounts = self.store.columns["amount"]
+            if result is None:
+                result = [key for key, amount in zip(all_keys, amounts) if low <= amount <= high]
+            elif len(result) * 8 > len(all_keys):
+                # Large candidate set: one pass over the column beats a lookup per key
+                wanted = set(result)
+                result = [
+                    key for key, amount in zip(all_keys, amounts)
+                    if key in wanted and low <= amount <= high
+                ]
+            else:
+                index_of = self.store.index_of
+                result = [key for key in result if low <= amounts[index_of(key)] <= high]
+
+        return list(all_keys) if result is None else list(result)
@@ -0,0 +1,498 @@
+# ===================== EXPENSE STORE =====================
+# Typed in-memory ledger • Column-oriented • No GUI imports
+# ---------------------------------------------------------
+#
+# The store is the single source of truth for the expenses. Each field is
+# kept in its own list and the tksheet widget only displays the formatted
+# rows. Nothing here touches tkinter, so the store can be imported and
+# benchmarked without a display.
+#
+# The columns hold the compact form of the rows: amounts and converted
+# amounts as integer cents (None while pending), currency / category /
+# payment strings interned so every row shares one object per value, and
+# one shared date object per day. That is about a third of the memory of
+# per-row Decimal, str and date objects, and cents compare and sort as
+# plain ints. row() and iteration hand out Expense records with exact
+# Decimal amounts, as before.
+#
+# The converted total and the per-category subtotals are kept up to date
+# by deltas on every change (exact integer cents, no float drift), so
+# reading them never rescans the ledger. verify_totals() does a full
+# rescan when an explicit consistency check is wanted.
+#
+# load_iter() parses the recovered rows a chunk at a time so a GUI can
+# show the first rows right away (the GUI runs storage.open() on a worker
+# thread first, reading and replaying the files is the other half). Until
+# it finishes, a compaction writes the rows not parsed yet exactly as they
+# were read.
+#
+# Rows that cannot be parsed (a bad amount, a 2024-02-30 date) are kept in
+# self.rejected. A read-only load (list, reports, exports) only skips them
+# and writes nothing. A load for writing also deletes them from the
+# storage, because later changes address rows by position and the stored
+# positions have to match ours; the caller has to tell the user which rows
+# went.
+#
+# Every row also has an ordering key that grows with its position and
+# never changes while the row exists. Secondary structures (filters,
+# rollups, ...) register as observers and index rows by key, so an insert
+# at the top does not renumber them.
+
+import itertools
+import sys
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from instrument import timed
+
+COLUMNS = ("amount", "currency", "converted", "category", "payment", "date", "due_date")
+
+Expense = namedtuple("Expense", COLUMNS)
+
+CENT = Decimal("0.01")
+ZERO = Decimal("0")
+PENDING = "pending"  # converted amount still waiting for exchange rates
+LOAD_CHUNK = 2000  # rows parsed per step of load_iter()
+BATCH_RESET = 1000  # batch size above which observers rebuild instead of following each row
+
+
+# ===================== CONVERSION =====================
+def to_decimal(value):
+    """Exact Decimal from a string, int, Decimal or float"""
+    if isinstance(value, Decimal):
+        return value
+    if isinstance(value, float):
+        value = repr(value)  # avoid binary float expansion
+    return Decimal(value)
+
+def quantize(amount):
+    """Round an amount to cents"""
+    return to_decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP)
+
+def convert_amount(amount, from_rate, to_rate):
+    """Convert amount using two USD-based rates, rounded to cents"""
+    return quantize(to_decimal(amount) / to_decimal(from_rate) * to_decimal(to_rate))
+
+@timed
+def convert_column(rows, base, rate_pair):
+    """Converted amount in base of every (amount, currency, day) row
+
+    rate_pair(day, currency) returns the USD rates of currency and base, or
+    None when they are not known yet (the row comes out pending). Each
+    (day, currency) pair is looked up once, however many rows share it.
+    """
+    pairs = {}
+    converted = []
+    for amount, currency, day in rows:
+        if currency == base:
+            converted.append(quantize(amount))
+            continue
+        key = (day, currency)
+        if key not in pairs:
+            pairs[key] = rate_pair(day, currency)
+        rates = pairs[key]
+        converted.append(None if rates is None else convert_amount(amount, *rates))
+    return converted
+
+# ===================== COMPACT COLUMNS =====================
+_days = {}  # one shared date object per day (and per "YYYY-MM-DD" string)
+
+def to_cents(amount):
+    """Integer cents of an amount (rounded half-up)"""
+    return int(quantize(amount).scaleb(2))
+
+def from_cents(cents):
+    """Decimal amount of integer cents"""
+    return Decimal(cents).scaleb(-2)
+
+def text_cents(text):
+    """Integer cents of an amount string, like to_cents() but fast for plain "123.45" strings"""
+    whole, dot, frac = text.partition(".")
+    if len(frac) == 2 and whole.isdigit() and frac.isdigit():
+        return int(whole) * 100 + int(frac)
+    return to_cents(text)
+
+def cents_text(cents):
+    """"123.45" string of integer cents, as format_row() writes it"""
+    whole, frac = divmod(abs(cents), 100)
+    return f"{'-' if cents < 0 else ''}{whole}.{frac:02d}"
+
+def share_day(day):
+    """The shared date object equal to day (a date or a YYYY-MM-DD string)"""
+    shared = _days.get(day)
+    if shared is None:
+        shared = date.fromisoformat(day) if isinstance(day, str) else day
+        shared = _days.setdefault(shared, shared)
+        _days[day] = shared
+    return shared
+
+def pack(expense):
+    """Column values of an Expense"""
+    amount, currency, converted, category, payment, exp_date, due_date = expense
+    return (
+        to_cents(amount),
+        sys.intern(currency),
+        None if converted is None else to_cents(converted),
+        sys.intern(category),
+        sys.intern(payment),
+        share_day(exp_date),
+        share_day(due_date),
+    )
+
+def unpack(values):
+    """Expense of column values"""
+    amount, currency, converted, category, payment, exp_date, due_date = values
+    return Expense(
+        from_cents(amount),
+        currency,
+        None if converted is None else from_cents(converted),
+        category,
+        payment,
+        exp_date,
+        due_date,
+    )
+
+def parse_values(data):
+    """Column values of a row of strings"""
+    amount, currency, converted, category, payment, exp_date, due_date = data
+    return (
+        text_cents(amount),
+        sys.intern(currency.strip().upper()),
+        None if converted == PENDING else text_cents(converted),
+        sys.intern(category),
+        sys.intern(payment),
+        share_day(exp_date),
+        share_day(due_date),
+    )
+
+def format_values(values):
+    """Row of strings of column values, same as format_row(unpack(values))"""
+    amount, currency, converted, category, payment, exp_date, due_date = values
+    return [
+        cents_text(amount),
+        currency,
+        PENDING if converted is None else cents_text(converted),
+        category,
+        payment,
+        exp_date.isoformat(),
+        due_date.isoformat(),
+    ]
+
+def parse_row(data):
+    """Build a typed Expense from a row of strings"""
+    return unpack(parse_values(data))
+
+def format_row(expense):
+    """Format an Expense as the row of strings shown in the sheet and saved to disk"""
+    return [
+        f"{expense.amount:.2f}",
+        expense.currency,
+        PENDING if expense.converted is None else f"{expense.converted:.2f}",
+        expense.category,
+        expense.payment,
+        expense.date.isoformat(),
+        expense.due_date.isoformat(),
+    ]
+
+
+# ===================== STORE =====================
+class ExpenseStore:
+    """Column-oriented list of expenses, optionally persisted to a storage backend"""
+
+    def __init__(self, storage=None):
+        self.storage = storage
+        self.columns = {name: [] for name in COLUMNS}
+        self._lists = [self.columns[name] for name in COLUMNS]
+        self._total = 0  # cents
+        self.category_totals = {}  # cents
+        self.category_counts = {}
+        self.rejected = []  # rows of strings the last load could not parse
+        self._unparsed = None  # rows read but not parsed yet while loading
+        self.keys = []  # ordering key of each row, ascending with position
+        self.observers = []  # get row_added / row_removed / reset calls
+        if storage is not None:
+            storage.snapshot = self.snapshot
+
+    def __len__(self):
+        return len(self._lists[0])
+
+    def __iter__(self):
+        return map(unpack, zip(*self._lists))
+
+    def row(self, idx):
+        """Typed Expense at idx"""
+        return unpack([col[idx] for col in self._lists])
+
+    def index_of(self, key):
+        """Current position of the row with this ordering key"""
+        idx = bisect_left(self.keys, key)
+        if idx == len(self.keys) or self.keys[idx] != key:
+            raise KeyError(key)
+        return idx
+
+    def display_row(self, idx):
+        """Formatted strings for the row at idx"""
+        return format_values([col[idx] for col in self._lists])
+
+    def display_rows(self):
+        """Formatted strings for every row, in order"""
+        return [format_values(values) for values in zip(*self._lists)]
+
+    # ===================== CHANGES =====================
+    @timed
+    def load(self, readonly=False):
+        """Replace the contents with the rows recovered by the storage
+
+        Returns the rejected rows. readonly leaves them in the storage, the
+        store must not be changed afterwards.
+        """
+        for _ in self.load_iter(chunk_size=None, readonly=readonly):
+            pass
+        return self.rejected
+
+    def load_iter(self, chunk_size=LOAD_CHUNK, rows=None, readonly=False):
+        """Load like load(), parsing chunk_size rows per step
+
+        Yields (first, done, total) after each chunk: the new rows are
+        self[first:], done of total recovered rows have been parsed. rows
+        are what storage.open() returned, when the caller already ran it
+        (e.g. on a worker thread), otherwise it is called here.
+        """
+        for col in self._lists:
+            col.clear()
+        self.keys.clear()
+        self._total = 0  # cents
+        self.category_totals = {}  # cents
+        self.category_counts = {}
+        self.rejected = []
+        for observer in self.observers:
+            observer.reset()
+
+        if rows is None:
+            rows = self.storage.read() if readonly else self.storage.open()
+        total = len(rows)
+        chunk_size = chunk_size or total or 1
+        self._unparsed = (rows, 0)
+        try:
+            for start in range(0, total, chunk_size):
+                first = len(self)
+                bad = []  # storage positions of the rows that cannot be parsed
+                for data in rows[start:start + chunk_size]:
+                    try:
+                        self._insert(len(self), parse_values(data))
+                    except (ValueError, InvalidOperation):
+                        bad.append(len(self) + len(bad))
+                        self.rejected.append(data)
+                done = min(start + chunk_size, total)
+                self._unparsed = (rows, done)
+                if bad and not readonly:
+                    # Drop them from disk too, so stored positions keep matching ours
+                    self.storage.delete_many(bad)
+                yield first, done, total
+        finally:
+            self._unparsed = None
+
+    @timed
+    def insert(self, idx, expense):
+        """Insert an expense at idx"""
+        values = self._insert(idx, pack(expense))
+        if self.storage is not None:
+            self.storage.insert(idx, format_values(values))
+
+    @timed
+    def insert_many(self, idx, expenses):
+        """Insert several expenses at idx (in order), persisted as one batch"""
+        rows = list(map(pack, expenses))
+        if not rows:
+            return
+        keys = self._new_keys(idx, len(rows))
+        for col, values in zip(self._lists, zip(*rows)):
+            col[idx:idx] = values
+        self.keys[idx:idx] = keys
+        for values in rows:
+            self._count(values, 1)
+        if len(rows) <= BATCH_RESET:
+            for observer in self.observers:
+                for key, values in zip(keys, rows):
+                    observer.row_added(key, unpack(values))
+        else:
+            for observer in self.observers:
+                observer.reset()
+        if self.storage is not None:
+            self.storage.insert_many(idx, list(map(format_values, rows)))
+
+    @timed
+    def update(self, idx, expense):
+        """Replace the expense at idx"""
+        values = self._update(idx, pack(expense))
+        if self.storage is not None:
+            self.storage.update(idx, format_values(values))
+
+    @timed
+    def update_many(self, items):
+        """Replace several (idx, expense) pairs, persisted as one batch"""
+        items = [(idx, pack(expense)) for idx, expense in items]
+        notify = len(items) <= BATCH_RESET
+        for idx, values in items:
+            self._update(idx, values, notify)
+        if not notify:
+            for observer in self.observers:
+                observer.reset()
+        if self.storage is not None and items:
+            self.storage.update_many([(idx, format_values(values)) for idx, values in items])
+
+    @timed
+    def delete(self, idx):
+        """Delete the expense at idx"""
+        old = self._values(idx)
+        self._count(old, -1)
+        for col in self._lists:
+            del col[idx]
+        key = self.keys.pop(idx)
+        for observer in self.observers:
+            observer.row_removed(key, unpack(old))
+        if self.storage is not None:
+            self.storage.delete(idx)
+
+    @timed
+    def delete_many(self, indices):
+        """Delete the expenses at indices, persisted as one batch"""
+        positions = sorted(set(indices))
+        if not positions:
+            return
+        removed = [(self.keys[idx], self._values(idx)) for idx in positions]
+        for _, old in removed:
+            self._count(old, -1)
+        if len(positions) <= BATCH_RESET:
+            for idx in reversed(positions):
+                for col in self._lists:
+                    del col[idx]
+                del self.keys[idx]
+            for observer in self.observers:
+                for key, old in removed:
+                    observer.row_removed(key, unpack(old))
+        else:
+            # One pass per column instead of shifting the tail once per row
+            drop = set(positions)
+            for col in (*self._lists, self.keys):
+                col[:] = [value for i, value in enumerate(col) if i not in drop]
+            for observer in self.observers:
+                observer.reset()
+        if self.storage is not None:
+            self.storage.delete_many(positions)
+
+    def _values(self, idx):
+        return tuple(col[idx] for col in self._lists)
+
+    def _update(self, idx, values, notify=True):
+        old = self._values(idx)
+        self._count(old, -1)
+        self._count(values, 1)
+        for col, value in zip(self._lists, values):
+            col[idx] = value
+        if notify and self.observers:
+            key = self.keys[idx]
+            old, new = unpack(old), unpack(values)
+            for observer in self.observers:
+                observer.row_removed(key, old)
+                observer.row_added(key, new)
+        return values
+
+    def _insert(self, idx, values):
+        (key,) = self._new_keys(idx)
+        for col, value in zip(self._lists, values):
+            col.insert(idx, value)
+        self.keys.insert(idx, key)
+        self._count(values, 1)
+        if self.observers:
+            expense = unpack(values)
+            for observer in self.observers:
+                observer.row_added(key, expense)
+        return values
+
+    def _new_keys(self, idx, count=1):
+        """count ordering keys that sort between the rows around idx"""
+        keys = self.keys
+        if not keys:
+            return [float(i) for i in range(count)]
+        if idx >= len(keys):
+            last = keys[-1]
+            return [last + 1 + i for i in range(count)]
+        if idx <= 0:
+            first = keys[0]
+            return [first - count + i for i in range(count)]
+        before, after = keys[idx - 1], keys[idx]
+        step = (after - before) / (count + 1)
+        new = [before + step * (i + 1) for i in range(count)]
+        if before < new[0] and new[-1] < after and len(set(new)) == count:
+            return new
+        # Keys too close together: spread them out, observers rebuild
+        self.keys[:] = [float(i) for i in range(len(keys))]
+        for observer in self.observers:
+            observer.reset()
+        return self._new_keys(idx, count)
+
+    def _count(self, values, sign):
+        """Add (sign=1) or remove (sign=-1) a row from the running totals (cents)"""
+        category = values[3]
+        delta = (values[2] or 0) * sign  # pending rows count as zero
+        self._total += delta
+        count = self.category_counts.get(category, 0) + sign
+        if count:
+            self.category_counts[category] = count
+            self.category_totals[category] = self.category_totals.get(category, 0) + delta
+        else:
+            del self.category_counts[category]
+            del self.category_totals[category]
+
+    def pending_rows(self):
+        """Indexes of rows whose converted amount is still pending"""
+        converted = self.columns["converted"]
+        idx = -1
+        while True:
+            try:
+                idx = converted.index(None, idx + 1)
+            except ValueError:
+                return
+            yield idx
+
+    # ===================== AGGREGATION =====================
+    def total(self):
+        """Sum of the converted column"""
+        return from_cents(self._total)
+
+    def verify_totals(self):
+        """Rescan every row, fix the running totals and report if they were off"""
+        total = 0
+        category_totals = {}
+        category_counts = {}
+        for category, converted in zip(self.columns["category"], self.columns["converted"]):
+            converted = converted or 0
+            total += converted
+            category_totals[category] = category_totals.get(category, 0) + converted
+            category_counts[category] = category_counts.get(category, 0) + 1
+
+        consistent = (
+            total == self._total
+            and category_totals == self.category_totals
+            and category_counts == self.category_counts
+        )
+        self._total = total
+        self.category_totals = category_totals
+        self.category_counts = category_counts
+        return consistent
+
+    def snapshot(self):
+        """Rows for a journal compaction (text storage)
+
+        The columns are copied right away (cheap list copies) and formatted
+        lazily, so the compaction thread does the string work.
+        """
+        columns = [list(col) for col in self._lists]
+        rows = map(format_values, zip(*columns))
+        if self._unparsed is not None:
+            unparsed, done = self._unparsed
+            rows = itertools.chain(rows, unparsed[done:])
+        return rows
@@ -0,0 +1,330 @@
+# ===================== EXPENSES CLI =====================
+# Headless entry point • add / list / total / import / export / report
+# --------------------------------------------------------
+#
+# Uses the same store, storage, validation and conversion code as the
+# GUI, but never imports tkinter or customtkinter, so it can run from
+# scripts, cron jobs and servers. Each command imports only what it needs
+# (importer, exporter and rollups are loaded on demand). "add" never
+# loads the ledger (one journal append or one SQL INSERT, see
+# prepend()), and on a migrated SQLite ledger "list" and "total" are
+# indexed queries that don't load every row.
+#
+# A text ledger has one writer at a time (see journal.py): while the app
+# has it open, "add" and "import" wait a few seconds for it, then stop
+# with an error instead of writing changes the app would overwrite. The
+# read-only commands work alongside the app.
+#
+#     python expenses_cli.py add 12.50 USD --category "Food & Dining" --payment Cash
+#     python expenses_cli.py list --start 2024-05-01 --category "Food & Dining"
+#     python expenses_cli.py total --start 2024-05-01 --end 2024-05-31
+#     python expenses_cli.py import statement.ofx
+#     python expenses_cli.py export may.parquet --start 2024-05-01 --end 2024-05-31
+#     python expenses_cli.py report --by category
+#
+# Rates follow the GUI: the stored rate of the expense date, else the
+# cached latest table (refreshed once per RATES_TTL). --offline never
+# touches the network, rows without a local rate are saved as pending.
+
+import argparse
+import csv
+import sys
+from datetime import date
+
+from expense_store import COLUMNS, ExpenseStore, ZERO, convert_column, format_row
+from journal import JournalLocked
+from settings import load_settings
+from storage import SqliteStorage, open_storage
+
+DATA_FILE = "expenses.txt"
+DB_FILE = "expenses.sqlite3"
+RATES_FILE = "rates_cache.json"
+HISTORY_FILE = "rates_history.sqlite3"
+CURRENCY_FILE = "currency_index.json"
+SETTINGS_FILE = "settings.json"
+
+
+class CliError(Exception):
+    """Printed as "error: ..." with exit status 1"""
+
+
+# ===================== HELPERS =====================
+def load_store(args, readonly=False):
+    """Load the ledger, readonly for the commands that never write"""
+    return load_into(ExpenseStore(open_storage(args.data, args.db)), readonly)
+
+def load_into(store, readonly=False):
+    """Load store, warn about the rows it could not parse"""
+    rejected = store.load(readonly)
+    if rejected and readonly:
+        warn(f"skipped {len(rejected)} unreadable row(s)")
+    elif rejected:
+        # A writer drops them from the ledger for good, show what went
+        warn(f"removed {len(rejected)} unreadable row(s) from the ledger:")
+        for data in rejected:
+            print("  " + "|".join(data), file=sys.stderr)
+    return store
+
+def warn(message):
+    print(f"warning: {message}", file=sys.stderr)
+
+def currencies():
+    from currency_index import load_currency_index
+    return set(load_currency_index(CURRENCY_FILE).names)
+
+def rate_source(base, offline, fetch_days=True):
+    """rate_pair(day, currency) for convert_column(), None when no rate is known"""
+    from rates import HistoricalRates, RateCache, RateError
+
+    history = HistoricalRates(db_file=HISTORY_FILE)
+    cache = RateCache(cache_file=RATES_FILE)
+    reported = set()
+
+    def rate_pair(day, currency):
+        try:
+            if fetch_days and not offline and day < date.today():
+                history.backfill([day])
+            if history.has_day(day):
+                try:
+                    return history.lookup(day, currency, base)
+                except RateError:
+                    pass  # that day's table lacks the currency, use the latest rates
+            if offline:
+                return cache.lookup(currency, base)
+            return cache.rate_pair(currency, base)
+        except RateError as e:
+            if str(e) not in reported:
+                reported.add(str(e))
+                warn(f"{e}, saved as pending")
+            return None
+
+    return rate_pair, history
+
+def filters_of(args):
+    return {
+        name: getattr(args, name)
+        for name in ("start", "end", "category", "payment", "currency")
+        if getattr(args, name, None) is not None
+    }
+
+def matches(expense, start=None, end=None, category=None, payment=None, currency=None):
+    return (
+        (start is None or expense.date >= start)
+        and (end is None or expense.date <= end)
+        and (category is None or expense.category == category)
+        and (payment is None or expense.payment == payment)
+        and (currency is None or expense.currency == currency)
+    )
+
+def print_table(header, rows):
+    rows = [[str(cell) for cell in row] for row in rows]
+    widths = [max([len(h)] + [len(row[i]) for row in rows]) for i, h in enumerate(header)]
+    print("  ".join(h.ljust(w) for h, w in zip(header, widths)))
+    print("  ".join("-" * w for w in widths))
+    for row in rows:
+        print("  ".join(cell.ljust(w) for cell, w in zip(row, widths)))
+
+
+# ===================== COMMANDS =====================
+def cmd_add(args, settings):
+    from validation import validate_amount, validate_record
+
+    is_valid, result = validate_amount(args.amount)
+    if not is_valid:
+        raise CliError(result)
+    record = {
+        "amount": args.amount,
+        "currency": args.currency,
+        "category": args.category,
+        "payment": args.payment,
+        "date": args.date or date.today().isoformat(),
+        "due_date": args.due or "",
+    }
+    try:
+        expense = validate_record(record, currencies())
+    except ValueError as e:
+        raise CliError(str(e))
+
+    base = settings["base_currency"]
+    rate_pair, history = rate_source(base, args.offline)
+    (converted,) = convert_column([(expense.amount, expense.currency, expense.date)], base, rate_pair)
+    history.close()
+    expense = expense._replace(converted=converted)
+
+    # Newest first, like the GUI: one append / one INSERT, the ledger is not loaded
+    row = format_row(expense)
+    storage = open_storage(args.data, args.db)
+    if not storage.prepend(row):
+        store = load_store(args)  # repairs the torn journal first
+        store.insert(0, expense)
+        store.storage.close(compact=False)
+    storage.close(compact=False)
+    print("  ".join(row))
+
+def cmd_list(args, settings):
+    filters = filters_of(args)
+    storage = open_storage(args.data, args.db)
+    if isinstance(storage, SqliteStorage):
+        rows = storage.query(**filters)
+        storage.close(compact=False)
+    else:
+        store = load_into(ExpenseStore(storage), readonly=True)
+        rows = [format_row(e) for e in store if matches(e, **filters)]
+        storage.close(compact=False)
+    if args.limit is not None:
+        rows = rows[:args.limit]
+
+    if args.csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(COLUMNS)
+        writer.writerows(rows)
+    else:
+        print_table(COLUMNS, rows)
+
+def cmd_total(args, settings):
+    filters = filters_of(args)
+    base = settings["base_currency"]
+    storage = open_storage(args.data, args.db)
+    if isinstance(storage, SqliteStorage):
+        total = storage.total(**filters)
+    else:
+        store = load_into(ExpenseStore(storage), readonly=True)
+        if filters:
+            total = sum((e.converted or ZERO for e in store if matches(e, **filters)), ZERO)
+        else:
+            total = store.total()
+    storage.close(compact=False)
+    print(f"{total:.2f} {base}")
+
+def cmd_import(args, settings):
+    from importer import convert_expenses, read_records, rejects_file, validate_records, write_rejects
+    from rates import RateError
+
+    base = settings["base_currency"]
+    try:
+        result = validate_records(read_records(args.file, base), currencies(), args.workers)
+    except OSError as e:
+        raise CliError(f"cannot read {args.file}: {e.strerror}")
+
+    # One fetch of every missing day up front, then one rate snapshot
+    rate_pair, history = rate_source(base, args.offline, fetch_days=False)
+    if not args.offline:
+        days = {e.date for e in result.expenses if e.currency != base}
+        try:
+            history.backfill(days)
+        except RateError as e:
+            warn(f"{len(history.failed)} day(s) without historical rates: {e}")
+    result.expenses = convert_expenses(result.expenses, base, rate_pair)
+    history.close()
+
+    store = load_store(args)
+    store.insert_many(0, result.expenses)
+    store.storage.close(compact=False)
+
+    print(f"Imported {len(result.expenses)} expense(s)")
+    if result.skipped:
+        print(f"Skipped {result.skipped} credit(s)")
+    if result.rejected:
+        report = rejects_file(args.file)
+        write_rejects(report, result.rejected)
+        print(f"Rejected {len(result.rejected)} line(s), see {report}")
+
+def cmd_export(args, settings):
+    from exporter import export, select
+
+    store = load_store(args, readonly=True)
+    columns = select(store, start=args.start, end=args.end, category=args.category)
+    store.storage.close(compact=False)
+    try:
+        count = export(columns, args.file, args.format)
+    except (ValueError, ImportError) as e:
+        raise CliError(str(e))
+    print(f"Exported {count} expense(s) to {args.file}")
+
+def cmd_report(args, settings):
+    from rollups import ExpenseRollups
+
+    store = load_store(args, readonly=True)
+    store.storage.close(compact=False)
+    rollups = ExpenseRollups(store)
+    if args.month:
+        rows = rollups.month_summary(args.month)
+    else:
+        rows = rollups.report(args.by)
+
+    base = settings["base_currency"]
+    print_table(
+        [args.by if not args.month else "category", "expenses", f"total ({base})", "pending"],
+        [[value if not isinstance(value, tuple) else " / ".join(value),
+          bucket.count, f"{bucket.total:.2f}", bucket.pending or ""]
+         for value, bucket in rows],
+    )
+
+
+# ===================== ARGUMENTS =====================
+def add_filters(parser, ledger_only=False):
+    parser.add_argument("--start", type=date.fromisoformat, help="first date (YYYY-MM-DD)")
+    parser.add_argument("--end", type=date.fromisoformat, help="last date (YYYY-MM-DD)")
+    parser.add_argument("--category", help="only this category")
+    if not ledger_only:
+        parser.add_argument("--payment", help="only this payment method")
+        parser.add_argument("--currency", type=str.upper, help="only this original currency")
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="expenses_cli.py", description="Expenses Tracker from the command line")
+    parser.add_argument("--data", default=DATA_FILE, help="expenses text file")
+    parser.add_argument("--db", default=DB_FILE, help="expenses database (if migrated)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add one expense")
+    add.add_argument("amount")
+    add.add_argument("currency")
+    add.add_argument("--category", default="", help='category (default "Other")')
+    add.add_argument("--payment", default="", help='payment method (default "Bank Transfer")')
+    add.add_argument("--date", help="expense date, YYYY-MM-DD (default today)")
+    add.add_argument("--due", help="due date, YYYY-MM-DD (default the expense date)")
+    add.add_argument("--offline", action="store_true", help="no network, pending if no local rate")
+    add.set_defaults(run=cmd_add)
+
+    list_cmd = commands.add_parser("list", help="print expenses, newest first")
+    add_filters(list_cmd)
+    list_cmd.add_argument("--limit", type=int, help="at most this many rows")
+    list_cmd.add_argument("--csv", action="store_true", help="CSV instead of a table")
+    list_cmd.set_defaults(run=cmd_list)
+
+    total = commands.add_parser("total", help="sum of the converted amounts")
+    add_filters(total)
+    total.set_defaults(run=cmd_total)
+
+    import_cmd = commands.add_parser("import", help="bulk import a CSV or OFX file")
+    import_cmd.add_argument("file")
+    import_cmd.add_argument("--workers", type=int, default=1,
+                            help="validation processes for large files (default 1)")
+    import_cmd.add_argument("--offline", action="store_true", help="no network, pending if no local rate")
+    import_cmd.set_defaults(run=cmd_import)
+
+    export_cmd = commands.add_parser("export", help="export to .csv, .jsonl, .parquet or .arrow")
+    export_cmd.add_argument("file")
+    export_cmd.add_argument("--format", choices=("csv", "jsonl", "parquet", "arrow"),
+                            help="format (default: from the file extension)")
+    add_filters(export_cmd, ledger_only=True)
+    export_cmd.set_defaults(run=cmd_export)
+
+    report = commands.add_parser("report", help="totals by month, category, payment or currency")
+    report.add_argument("--by", default="month", choices=("month", "category", "payment", "currency"))
+    report.add_argument("--month", help="one month (YYYY-MM) broken down by category")
+    report.set_defaults(run=cmd_report)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        args.run(args, load_settings(SETTINGS_FILE))
+    except (CliError, JournalLocked) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
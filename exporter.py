@@ -0,0 +1,183 @@
+# ===================== EXPORT =====================
+# CSV • JSON Lines • Parquet / Arrow • Streamed in batches
+# --------------------------------------------------
+#
+# select() copies the columns of the rows to export, so the writing can
+# run on a worker thread while the GUI keeps changing the store. The copy
+# is O(n) but small: it holds references to the store's compact values
+# (integer cents, shared strings and dates), about 7 pointers or 56 bytes
+# per row, and nothing is formatted. The writers then stream those columns
+# EXPORT_BATCH rows at a time, so no list of formatted rows is ever built.
+# The formatting memory stays flat, only the reference copy grows with the
+# ledger.
+#
+# CSV and JSONL use the column names of the store (amount, currency,
+# converted, category, payment, date, due_date), so an exported CSV can be
+# imported again. Pending conversions are empty (CSV) or null (JSON).
+# Parquet and Arrow keep the types: exact decimal(18, 2) amounts,
+# dictionary-encoded text columns and date32 dates. They need pyarrow,
+# which is only imported for those two formats (pip install pyarrow).
+
+import csv
+import importlib.util
+import json
+import os
+
+from expense_store import COLUMNS, cents_text, from_cents
+
+EXPORT_BATCH = 10000  # rows per write / Arrow record batch
+FORMATS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+}
+
+
+def format_for(path):
+    """Export format from a file name"""
+    fmt = FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Unknown export format: {path} (use {', '.join(FORMATS)})")
+    return fmt
+
+
+# ===================== SELECTION =====================
+def select(store, keys=None, start=None, end=None, category=None):
+    """Columns of the rows to export, copied from the store
+
+    keys (ordering keys, e.g. from ExpenseIndex.search()) picks the rows
+    directly, otherwise start / end (dates, inclusive) and category filter.
+    """
+    columns = [store.columns[name] for name in COLUMNS]
+    if keys is not None:
+        positions = [store.index_of(key) for key in keys]
+    elif start is None and end is None and category is None:
+        return [list(col) for col in columns]
+    else:
+        positions = [
+            i for i, (day, cat) in enumerate(zip(store.columns["date"], store.columns["category"]))
+            if (start is None or day >= start)
+            and (end is None or day <= end)
+            and (category is None or cat == category)
+        ]
+    return [[col[i] for i in positions] for col in columns]
+
+def _batches(columns):
+    total = len(columns[0])
+    for first in range(0, total, EXPORT_BATCH):
+        yield [col[first:first + EXPORT_BATCH] for col in columns]
+
+
+# ===================== WRITERS =====================
+def _money(cents):
+    return "" if cents is None else cents_text(cents)
+
+def write_csv(columns, f):
+    writer = csv.writer(f)
+    writer.writerow(COLUMNS)
+    for amount, currency, converted, category, payment, day, due in _batches(columns):
+        writer.writerows(zip(
+            map(_money, amount), currency, map(_money, converted), category, payment,
+            map(str, day), map(str, due),
+        ))
+
+def write_jsonl(columns, f):
+    # Two-decimal amounts survive float: the shortest repr reads back the same
+    for batch in _batches(columns):
+        f.write("".join(
+            json.dumps({
+                "amount": amount / 100,
+                "currency": currency,
+                "converted": None if converted is None else converted / 100,
+                "category": category,
+                "payment": payment,
+                "date": day.isoformat(),
+                "due_date": due.isoformat(),
+            }, ensure_ascii=False) + "\n"
+            for amount, currency, converted, category, payment, day, due in zip(*batch)
+        ))
+
+def arrow_schema():
+    import pyarrow as pa
+
+    money = pa.decimal128(18, 2)
+    text = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("amount", money),
+        ("currency", text),
+        ("converted", money),
+        ("category", text),
+        ("payment", text),
+        ("date", pa.date32()),
+        ("due_date", pa.date32()),
+    ])
+
+def _record_batches(columns, schema):
+    import pyarrow as pa
+
+    # One dictionary per text column for the whole file (the Arrow file
+    # format cannot switch dictionaries between batches)
+    dictionaries = {}
+    for i, field in enumerate(schema):
+        if pa.types.is_dictionary(field.type):
+            values = sorted(set(columns[i]))
+            dictionaries[i] = pa.array(values, pa.string()), {v: n for n, v in enumerate(values)}
+
+    for batch in _batches(columns):
+        arrays = []
+        for i, (values, field) in enumerate(zip(batch, schema)):
+            if i in dictionaries:
+                dictionary, codes = dictionaries[i]
+                indices = pa.array([codes[v] for v in values], pa.int32())
+                arrays.append(pa.DictionaryArray.from_arrays(indices, dictionary))
+            elif pa.types.is_decimal(field.type):
+                decimals = [None if cents is None else from_cents(cents) for cents in values]
+                arrays.append(pa.array(decimals, type=field.type))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        yield pa.record_batch(arrays, schema=schema)
+
+def write_parquet(columns, path):
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in _record_batches(columns, schema):
+            writer.write_batch(batch)
+
+def write_arrow(columns, path):
+    import pyarrow as pa
+
+    schema = arrow_schema()
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        for batch in _record_batches(columns, schema):
+            writer.write_batch(batch)
+
+
+def export(columns, path, fmt=None):
+    """Write selected columns to path (format from the extension), return the row count"""
+    fmt = fmt or format_for(path)
+    if fmt in ("parquet", "arrow") and importlib.util.find_spec("pyarrow") is None:
+        raise ImportError("Parquet / Arrow export needs pyarrow (pip install pyarrow)")
+    tmp_file = path + ".tmp"
+    try:
+        if fmt == "csv":
+            with open(tmp_file, "w", encoding="utf-8", newline="") as f:
+                write_csv(columns, f)
+        elif fmt == "jsonl":
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                write_jsonl(columns, f)
+        elif fmt == "parquet":
+            write_parquet(columns, tmp_file)
+        elif fmt == "arrow":
+            write_arrow(columns, tmp_file)
+        else:
+            raise ValueError(f"Unknown export format: {fmt}")
+        os.replace(tmp_file, path)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return len(columns[0])
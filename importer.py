@@ -0,0 +1,282 @@
+# ===================== BULK IMPORT =====================
+# CSV and OFX statements • Batched / parallel validation • One transaction
+# -------------------------------------------------------
+#
+# read_records() streams a file into plain dicts of strings, one per
+# transaction, without loading it whole. validate_records() checks them in
+# batches of VALIDATE_BATCH (optionally over worker processes for large files),
+# and keeps every rejected line with its reasons. convert_expenses() fills
+# in the converted amounts from one rate snapshot (each day / currency
+# pair looked up once). The caller then adds everything with a single
+# ExpenseStore.insert_many(), which the storage writes as one batch.
+#
+# CSV files need a header row naming the columns (amount, currency,
+# category, payment, date, due_date, a few common spellings are accepted),
+# or have the seven expenses.txt columns in order. OFX files are bank
+# statements: every debit becomes an expense, credits are skipped. CSV
+# credits are skipped too: the positive lines of a file that shows
+# spending as negative amounts, and lines with only a credit / deposit
+# column filled in.
+
+import csv
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from expense_store import convert_column
+from validation import validate_record
+
+VALIDATE_BATCH = 5000  # records per validation batch
+PARALLEL_MIN = 50000  # records before validation is spread over processes
+READ_CHUNK = 1 << 16  # bytes read at a time from OFX files
+
+FIELD_NAMES = {
+    "amount": ("amount", "value", "sum", "debit"),
+    "currency": ("currency", "ccy", "currency code"),
+    "category": ("category", "type"),
+    "payment": ("payment", "payment method", "payment_method", "method"),
+    "date": ("date", "expense date", "expense_date", "posted", "transaction date"),
+    "due_date": ("due date", "due_date", "due"),
+}
+CREDIT_NAMES = ("credit", "credits", "deposit", "deposits", "money in", "paid in")
+FILE_COLUMNS = ("amount", "currency", "converted", "category", "payment", "date", "due_date")
+
+OFX_PAYMENTS = {
+    "ATM": "Cash",
+    "CASH": "Cash",
+    "POS": "Debit Card",
+    "CHECK": "Check",
+    "PAYMENT": "Bank Transfer",
+    "DIRECTDEBIT": "Bank Transfer",
+    "XFER": "Bank Transfer",
+}
+
+
+class ImportResult:
+    """Expenses ready to insert plus the lines that were rejected"""
+
+    def __init__(self):
+        self.expenses = []
+        self.rejected = []  # (line number, reason, raw record)
+        self.skipped = 0    # credits and other non-expense lines
+
+
+# ===================== READING =====================
+def read_records(path, default_currency):
+    """(line number, record dict) for every transaction in a CSV or OFX file"""
+    if os.path.splitext(path)[1].lower() in (".ofx", ".qfx"):
+        return read_ofx(path, default_currency)
+    return read_csv(path, default_currency)
+
+def _column_map(header):
+    names = [name.strip().lower() for name in header]
+    columns = {}
+    for field, aliases in (*FIELD_NAMES.items(), ("credit", CREDIT_NAMES)):
+        for i, name in enumerate(names):
+            if name in aliases:
+                columns[field] = i
+                break
+    return columns
+
+def _blank(amount):
+    """True for an empty or zero amount cell"""
+    return not amount.strip().lstrip("-").replace(",", "").strip("0.")
+
+def read_csv(path, default_currency):
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;|\t")
+        except csv.Error:
+            dialect = csv.excel
+        first = next(csv.reader(f, dialect), None)
+        if first is None:
+            return
+        columns = _column_map(first)
+        header = "amount" in columns
+        if not header:
+            # No header: the expenses.txt column order
+            columns = {field: i for i, field in enumerate(FILE_COLUMNS) if field != "converted"}
+
+        # A first pass for the sign convention: when spending shows as
+        # negative amounts, the positive lines are money in
+        f.seek(0)
+        column = columns["amount"]
+        signed = any(
+            row[column].strip().startswith("-")
+            for row in csv.reader(f, dialect) if len(row) > column
+        )
+
+        f.seek(0)
+        reader = csv.reader(f, dialect)
+        if header:
+            next(reader)
+        yield from _csv_records(
+            ((reader.line_num, row) for row in reader), columns, default_currency, signed
+        )
+
+def _csv_records(rows, columns, default_currency, signed=False):
+    for line, row in rows:
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        record = {field: row[i] if i < len(row) else "" for field, i in columns.items()}
+        if not (record.get("currency") or "").strip():
+            record["currency"] = default_currency
+        amount = record["amount"].strip()
+        if _blank(amount):
+            credit = not _blank(record.get("credit", ""))
+        else:
+            credit = signed and not amount.startswith("-")
+        record["credit"] = "1" if credit else ""
+        yield line, record
+
+def _ofx_value(block, tag):
+    match = re.search(rf"<{tag}>([^<\r\n]*)", block, re.IGNORECASE)
+    return match.group(1).strip() if match else ""
+
+def read_ofx(path, default_currency):
+    """Statement transactions (<STMTTRN> blocks), read a chunk at a time"""
+    currency = default_currency
+    number = 0
+    buffer = ""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            buffer += chunk
+            upper = buffer.upper()
+            if "<CURDEF>" in upper:
+                currency = _ofx_value(buffer, "CURDEF") or currency
+            while True:
+                start = upper.find("<STMTTRN>")
+                end = upper.find("</STMTTRN>", start)
+                if start < 0 or end < 0:
+                    break
+                block = buffer[start:end]
+                buffer = buffer[end + len("</STMTTRN>"):]
+                upper = buffer.upper()
+                number += 1
+                yield number, _ofx_record(block, currency)
+            if not chunk:
+                break
+            # Keep only what an unfinished transaction may need
+            start = upper.find("<STMTTRN>")
+            buffer = buffer[start:] if start >= 0 else buffer[-len("<STMTTRN>"):]
+
+def _ofx_record(block, currency):
+    posted = _ofx_value(block, "DTPOSTED")
+    day = f"{posted[0:4]}-{posted[4:6]}-{posted[6:8]}" if len(posted) >= 8 else posted
+    amount = _ofx_value(block, "TRNAMT")
+    kind = _ofx_value(block, "TRNTYPE").upper()
+    return {
+        "amount": amount,
+        "currency": _ofx_value(block, "CURRENCY") or currency,
+        "category": "",
+        "payment": OFX_PAYMENTS.get(kind, ""),
+        "date": day,
+        "due_date": day,
+        # Credits (money in) are not expenses
+        "credit": "1" if amount and not amount.startswith("-") and kind != "DEBIT" else "",
+    }
+
+
+# ===================== VALIDATION =====================
+def _validate_batch(args):
+    """Validate one batch, in this process or a worker"""
+    batch, currencies = args
+    expenses = []
+    rejected = []
+    skipped = 0
+    for line, record in batch:
+        if record.get("credit"):
+            skipped += 1
+            continue
+        try:
+            expenses.append(validate_record(record, currencies))
+        except ValueError as e:
+            rejected.append((line, str(e), record))
+    return expenses, rejected, skipped
+
+def _batches(records, currencies):
+    batch = []
+    for item in records:
+        batch.append(item)
+        if len(batch) == VALIDATE_BATCH:
+            yield batch, currencies
+            batch = []
+    if batch:
+        yield batch, currencies
+
+def validate_records(records, currencies, workers=1):
+    """Validate records in batches, over worker processes for large inputs
+
+    Validation is cheap per record, so shipping batches to other processes
+    only pays off on slow, many-core machines: workers > 1 (or None for
+    one per core) opts in once a file has PARALLEL_MIN records. Keep the
+    default in the GUI, whose main module cannot be imported again by a
+    worker process.
+    """
+    result = ImportResult()
+    currencies = frozenset(currencies)
+    batches = _batches(records, currencies)
+
+    # Validate the first batches here, only go parallel once the file is big
+    pending = []
+    counted = 0
+    for batch in batches:
+        pending.append(batch)
+        counted += len(batch[0])
+        if counted >= PARALLEL_MIN:
+            break
+    parallel = counted >= PARALLEL_MIN and workers != 1
+
+    if parallel:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(_validate_batch, _chain(pending, batches))
+            _collect(result, results)
+    else:
+        _collect(result, map(_validate_batch, _chain(pending, batches)))
+    return result
+
+def _chain(first, rest):
+    yield from first
+    yield from rest
+
+def _collect(result, batch_results):
+    for expenses, rejected, skipped in batch_results:
+        result.expenses.extend(expenses)
+        result.rejected.extend(rejected)
+        result.skipped += skipped
+
+
+# ===================== CONVERSION / REPORT =====================
+def convert_expenses(expenses, base, rate_pair):
+    """Fill in the converted amounts from one rate snapshot (see convert_column)"""
+    converted = convert_column(
+        ((e.amount, e.currency, e.date) for e in expenses), base, rate_pair
+    )
+    return [e._replace(converted=value) for e, value in zip(expenses, converted)]
+
+def import_file(path, currencies, base, rate_pair, workers=1, backfill=None):
+    """Read, validate and convert a CSV / OFX file, return an ImportResult
+
+    backfill(days), when given, is called with the dates of the rows not in
+    base before converting, to fetch the rates that are not stored yet.
+    """
+    result = validate_records(read_records(path, base), currencies, workers)
+    if backfill is not None:
+        backfill({e.date for e in result.expenses if e.currency != base})
+    result.expenses = convert_expenses(result.expenses, base, rate_pair)
+    return result
+
+def write_rejects(path, rejected):
+    """Write the rejected lines with their reasons to a CSV file"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["line", "reason", *FIELD_NAMES])
+        for line, reason, record in rejected:
+            writer.writerow([line, reason, *(record.get(field, "") for field in FIELD_NAMES)])
+
+def rejects_file(path):
+    """Where write_rejects() puts the rejects of an imported file"""
+    return os.path.splitext(path)[0] + ".rejects.csv"
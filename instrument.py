@@ -0,0 +1,131 @@
+# ===================== INSTRUMENTATION =====================
+# Decorator timers • Counters • Latency histograms • No GUI imports
+# -----------------------------------------------------------
+#
+# @timed records how long every call of a function takes into a Histogram
+# named after it (log-spaced millisecond buckets plus count, total and
+# max). count() only counts. Recording is one perf_counter pair and a
+# few updates under a lock, cheap enough to stay on all the time, and
+# calls on worker threads (fetches, compactions) are recorded too.
+#
+# latest() is the most recent timing, for the GUI's latency readout.
+# report() summarizes every operation, and dump() appends that to
+# PERF_LOG (the GUI does it on exit), so a slow session can be examined
+# afterwards without attaching a profiler.
+
+import functools
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+
+PERF_LOG = "perf_histograms.log"
+BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = threading.Lock()
+histograms = {}  # name -> Histogram
+counters = {}    # name -> count
+_latest = None   # (sequence, name, milliseconds) of the last timing
+_sequence = 0
+
+
+class Histogram:
+    """Call count, total / max time and a bucket count per latency range"""
+
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0  # milliseconds
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)  # the last one is "slower than 10 s"
+
+    def add(self, ms):
+        self.count += 1
+        self.total += ms
+        if ms > self.max:
+            self.max = ms
+        self.buckets[bisect_left(BUCKETS_MS, ms)] += 1
+
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (ms)"""
+        rank = q / 100 * self.count
+        seen = 0
+        for bound, hits in zip(BUCKETS_MS, self.buckets):
+            seen += hits
+            if hits and seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+# ===================== RECORDING =====================
+def record(name, seconds):
+    """Add one timing (in seconds) to the histogram of name"""
+    global _latest, _sequence
+    ms = seconds * 1000
+    with _lock:
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.add(ms)
+        _sequence += 1
+        _latest = (_sequence, name, ms)
+
+def count(name, n=1):
+    """Add n to the counter of name"""
+    with _lock:
+        counters[name] = counters.get(name, 0) + n
+
+def timed(func=None, *, name=None):
+    """Decorator recording the duration of every call (@timed or @timed(name=...))"""
+    def decorate(func):
+        label = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(label, time.perf_counter() - start)
+        return wrapper
+    return decorate(func) if func is not None else decorate
+
+
+# ===================== READING =====================
+def latest():
+    """(sequence, name, ms) of the last timing, None before the first one"""
+    return _latest
+
+def histogram(name):
+    """Histogram of name, None if it was never timed"""
+    return histograms.get(name)
+
+def report():
+    """Text summary of every timer and counter, slowest total first"""
+    with _lock:
+        timers = sorted(histograms.items(), key=lambda item: -item[1].total)
+        counts = sorted(counters.items())
+
+    lines = [f"{'operation':<32} {'calls':>8} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9} {'total':>10}"]
+    for name, h in timers:
+        lines.append(
+            f"{name:<32} {h.count:>8} {h.mean():>7.2f}ms {h.percentile(50):>7.2f}ms"
+            f" {h.percentile(95):>7.2f}ms {h.max:>7.2f}ms {h.total / 1000:>9.2f}s"
+        )
+        lines.append("    " + "  ".join(
+            f"≤{bound:g}ms:{hits}" for bound, hits in zip(BUCKETS_MS, h.buckets) if hits
+        ) + (f"  >{BUCKETS_MS[-1]:g}ms:{h.buckets[-1]}" if h.buckets[-1] else ""))
+    for name, n in counts:
+        lines.append(f"{name:<32} {n:>8}")
+    return "\n".join(lines)
+
+def dump(path=PERF_LOG):
+    """Append the report to path, with a timestamp header"""
+    if not histograms and not counters:
+        return
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(f"Session timings ({datetime.now():%Y-%m-%d %H:%M:%S})\n{report()}\n\n")
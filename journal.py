@@ -0,0 +1,359 @@
+# ===================== EXPENSES JOURNAL =====================
+# Append-only change log • Background compaction • Crash recovery
+# ------------------------------------------------------------
+#
+# Every add / update / delete is appended to "<data file>.journal" as one
+# JSON line, so a single edit costs one small write instead of rewriting
+# the whole ledger. Once enough records pile up, a background thread
+# compacts the rows into a fresh snapshot (the usual pipe-delimited
+# expenses.txt) and trims the journal down to whatever was appended while
+# it was writing.
+#
+# When a ``snapshot`` callable is set (the ExpenseStore does this), the
+# journal hands its rows over after recovery and asks the callable for the
+# current rows at compaction time instead of keeping its own copy.
+#
+# The snapshot starts with a "#seq=N" header line (ignored by the old
+# loaders, it has a single field) so recovery knows which journal records
+# are already included and only replays the tail. Rows are written with
+# the csv module using "|" as the delimiter. A field that contains "|" or
+# a quote is quoted, and every other row is a plain pipe-delimited line,
+# as before.
+#
+# Journal records address rows by position and the sequence numbers live
+# in memory, so only one process may write a ledger at a time. From open()
+# to close() the journal holds an exclusive lock on "<data file>.lock"
+# (flock, or msvcrt on Windows), and prepend() takes the same lock for its
+# one append. Another writer waits up to lock_wait seconds, then gets
+# JournalLocked. read() takes no lock, the snapshot is replaced atomically
+# and a torn journal tail is ignored.
+
+import csv
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from instrument import timed
+
+JOURNAL_SUFFIX = ".journal"
+LOCK_SUFFIX = ".lock"
+COMPACT_EVERY = 500  # journal records before a background compaction
+TAIL_BYTES = 4096  # end of the journal read by prepend() to find the last record
+LOCK_WAIT = 5  # seconds a writer waits for another process to release the ledger
+
+INSERT = "I"
+UPDATE = "U"
+DELETE = "D"
+
+
+class JournalLocked(Exception):
+    """Another process has the ledger open for writing"""
+
+
+# ===================== LOCKING =====================
+def lock_file(path, wait=LOCK_WAIT):
+    """Open path and lock it exclusively, waiting up to wait seconds"""
+    f = open(path, "a+b")
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return f
+        except OSError:
+            if time.monotonic() >= deadline:
+                f.close()
+                raise JournalLocked(
+                    f"{path[:-len(LOCK_SUFFIX)]} is open in another program,"
+                    " try again once it is closed"
+                ) from None
+            time.sleep(0.1)
+
+def unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    f.close()
+
+
+class ExpenseJournal:
+    """Row list persisted as a snapshot file plus an append-only journal"""
+
+    def __init__(self, data_file, compact_every=COMPACT_EVERY):
+        self.data_file = data_file
+        self.journal_file = data_file + JOURNAL_SUFFIX
+        self.compact_every = compact_every
+        self.lock_wait = LOCK_WAIT
+        self.snapshot = None  # callable returning the current rows
+
+        self.rows = []
+        self.seq = 0          # sequence number of the last applied record
+        self.pending = 0      # records appended since the last compaction
+
+        self._lock = threading.Lock()
+        self._lock_file = None  # held from open() to close()
+        self._journal = None
+        self._compactor = None
+        self._tail = None     # records appended while a compaction runs
+
+    # ===================== RECOVERY =====================
+    @timed
+    def open(self):
+        """Lock the ledger, load the snapshot, replay the journal tail and return the rows"""
+        if self._lock_file is None:
+            self._lock_file = lock_file(self.data_file + LOCK_SUFFIX, self.lock_wait)
+        try:
+            snapshot_seq = self._load_snapshot()
+            self.seq = snapshot_seq
+            self._replay(snapshot_seq)
+            self._journal = open(self.journal_file, "a", encoding="utf-8")
+        except BaseException:
+            self._unlock()
+            raise
+        rows = self.rows
+        if self.snapshot is not None:
+            self.rows = None  # the owner keeps the rows from now on
+        return rows
+
+    def read(self):
+        """Recover the rows without opening the journal for writing"""
+        snapshot_seq = self._load_snapshot()
+        self.seq = snapshot_seq
+        self._replay(snapshot_seq, truncate=False)
+        return self.rows
+
+    def _load_snapshot(self):
+        """Read the snapshot rows, return the sequence number it covers"""
+        self.rows = []
+        snapshot_seq = 0
+        if not os.path.exists(self.data_file):
+            return snapshot_seq
+
+        with open(self.data_file, "r", encoding="utf-8", newline="") as f:
+            for data in csv.reader(f, delimiter="|"):
+                if len(data) == 7:  # Ensure correct number of fields
+                    self.rows.append(data)
+                elif len(data) == 1 and data[0].startswith("#seq="):
+                    snapshot_seq = int(data[0][5:])
+        return snapshot_seq
+
+    def _replay(self, snapshot_seq, truncate=True):
+        """Apply journal records newer than the snapshot"""
+        if not os.path.exists(self.journal_file):
+            return
+
+        good_bytes = 0
+        with open(self.journal_file, "rb") as f:
+            for raw in f:
+                try:
+                    record = json.loads(raw.decode("utf-8"))
+                except (ValueError, UnicodeDecodeError):
+                    break  # torn write from a crash, drop the rest
+                good_bytes += len(raw)
+                if record["seq"] <= snapshot_seq:
+                    continue  # already part of the snapshot
+                self._apply(record["op"], record["idx"], record.get("row"))
+                self.seq = record["seq"]
+                self.pending += 1
+
+        if truncate and good_bytes < os.path.getsize(self.journal_file):
+            with open(self.journal_file, "r+b") as f:
+                f.truncate(good_bytes)
+
+    # ===================== CHANGES =====================
+    def prepend(self, row):
+        """Insert a row at the top without recovering the ledger (one append)
+
+        For one-shot writers like the CLI. Returns False, writing nothing,
+        when the journal ends in a torn write: open() has to repair it first.
+        Raises JournalLocked while another process has the ledger open.
+        """
+        locked = lock_file(self.data_file + LOCK_SUFFIX, self.lock_wait)
+        try:
+            seq = self._last_seq()
+            if seq is None:
+                return False
+            record = {"seq": seq + 1, "op": INSERT, "idx": 0, "row": list(row)}
+            with open(self.journal_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            return True
+        finally:
+            unlock_file(locked)
+
+    def _last_seq(self):
+        """Sequence number of the last change on disk, None after a torn write"""
+        seq = 0
+        if os.path.exists(self.data_file):
+            with open(self.data_file, "r", encoding="utf-8") as f:
+                first = f.readline().strip()
+            if first.startswith("#seq="):
+                seq = int(first[5:])
+        if not os.path.exists(self.journal_file):
+            return seq
+        with open(self.journal_file, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(0, f.tell() - TAIL_BYTES))
+            tail = f.read()
+        if not tail:
+            return seq
+        if not tail.endswith(b"\n"):
+            return None
+        try:
+            return max(seq, json.loads(tail.splitlines()[-1].decode("utf-8"))["seq"])
+        except (ValueError, KeyError, UnicodeDecodeError):
+            return None
+
+    def insert(self, idx, row):
+        """Insert a row at idx"""
+        self._append(INSERT, idx, list(row))
+
+    def update(self, idx, row):
+        """Replace the row at idx"""
+        self._append(UPDATE, idx, list(row))
+
+    def delete(self, idx):
+        """Delete the row at idx"""
+        self._append(DELETE, idx, None)
+
+    def insert_many(self, idx, rows):
+        """Insert several rows at idx, in order, in one write"""
+        self._append_batch([(INSERT, idx + i, list(row)) for i, row in enumerate(rows)])
+
+    def update_many(self, items):
+        """Replace several (idx, row) pairs in one write"""
+        self._append_batch([(UPDATE, idx, list(row)) for idx, row in items])
+
+    def delete_many(self, indices):
+        """Delete the rows at indices (positions before the deletion) in one write"""
+        self._append_batch([(DELETE, idx, None) for idx in sorted(indices, reverse=True)])
+
+    def _append_batch(self, changes):
+        """Append a batch, or write it straight into a fresh snapshot
+
+        A batch at least as large as a compaction interval would be
+        compacted right away anyway, so it skips the journal.
+        """
+        self._check_open()
+        if len(changes) < self.compact_every:
+            self._append_many(changes)
+            return
+        if self._compactor is not None:
+            self._compactor.join()  # its snapshot predates this batch
+        with self._lock:
+            for op, idx, row in changes:
+                self._apply(op, idx, row)
+        self.compact(wait=True)
+
+    def _check_open(self):
+        """Refuse to write a ledger this journal has not locked with open()"""
+        if self._journal is None:
+            raise JournalLocked(f"{self.data_file} is not open for writing")
+
+    def _apply(self, op, idx, row):
+        if self.rows is None:
+            return
+        if op == INSERT:
+            self.rows.insert(idx, row)
+        elif op == UPDATE:
+            self.rows[idx] = row
+        elif op == DELETE:
+            del self.rows[idx]
+        else:
+            raise ValueError(f"Unknown journal operation: {op}")
+
+    def _append(self, op, idx, row):
+        self._append_many([(op, idx, row)])
+
+    @timed
+    def _append_many(self, changes):
+        self._check_open()
+        with self._lock:
+            lines = []
+            for op, idx, row in changes:
+                self._apply(op, idx, row)
+                self.seq += 1
+                record = {"seq": self.seq, "op": op, "idx": idx}
+                if row is not None:
+                    record["row"] = row
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            self._journal.write("".join(lines))
+            self._journal.flush()
+            if self._tail is not None:
+                self._tail.extend(lines)
+            self.pending += len(lines)
+
+        if self.pending >= self.compact_every:
+            self.compact()
+
+    # ===================== COMPACTION =====================
+    def compact(self, wait=False):
+        """Write a fresh snapshot in the background and trim the journal"""
+        self._check_open()
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                compactor = self._compactor
+            else:
+                if self.snapshot is not None:
+                    rows = self.snapshot()
+                else:
+                    rows = [list(r) for r in self.rows]
+                self._tail = []
+                self.pending = 0
+                compactor = threading.Thread(
+                    target=self._compact, args=(rows, self.seq), daemon=True
+                )
+                self._compactor = compactor
+                compactor.start()
+        if wait:
+            compactor.join()
+
+    @timed
+    def _compact(self, rows, snapshot_seq):
+        tmp_file = self.data_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8", newline="") as f:
+            f.write(f"#seq={snapshot_seq}\n")
+            csv.writer(f, delimiter="|", lineterminator="\n").writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+
+        # Keep only the records that arrived while the snapshot was written
+        with self._lock:
+            tmp_journal = self.journal_file + ".tmp"
+            with open(tmp_journal, "w", encoding="utf-8") as f:
+                f.writelines(self._tail)
+                f.flush()
+                os.fsync(f.fileno())
+            self._journal.close()
+            os.replace(tmp_journal, self.journal_file)
+            self._journal = open(self.journal_file, "a", encoding="utf-8")
+            self._tail = None
+
+    def close(self, compact=True):
+        """Compact once more (unless compact=False), close the journal and unlock"""
+        if self._journal is None:
+            return
+        if self.pending and compact:
+            self.compact(wait=True)
+        elif self._compactor is not None:
+            self._compactor.join()
+        self._journal.close()
+        self._journal = None
+        self._unlock()
+
+    def _unlock(self):
+        if self._lock_file is not None:
+            unlock_file(self._lock_file)
+            self._lock_file = None
@@ -0,0 +1,380 @@
+# ===================== EXCHANGE RATES =====================
+# CurrencyFreaks client • Time-bounded cache • Offline fallback
+# ----------------------------------------------------------
+#
+# One request to CurrencyFreaks returns the whole USD-based rates table,
+# so the table is cached in memory and in a small JSON file together with
+# the time it was fetched. Every conversion inside the TTL is served from
+# the cache, and when the API cannot be reached the last snapshot is used
+# (marked stale) so the app keeps working offline.
+#
+# fetch_async() refreshes the table on a worker thread and reports back
+# through a queue, so the GUI never blocks on the network.
+#
+# HistoricalRates keeps one table per day in a small SQLite file, so an
+# expense is converted with the rate of its own date. Missing days are
+# fetched once (see "python rates.py backfill") and every later
+# conversion is a local lookup.
+#
+# requests and python-dotenv are only imported on first use, they are slow
+# to load and most starts never need them (rates are usually cached).
+
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from expense_store import to_decimal
+from instrument import count, timed
+
+RATES_URL = "https://api.currencyfreaks.com/v2.0/rates/latest?apikey={api_key}"
+HISTORY_URL = "https://api.currencyfreaks.com/v2.0/rates/historical?apikey={api_key}&date={day}"
+RATES_FILE = "rates_cache.json"
+HISTORY_FILE = "rates_history.sqlite3"
+RATES_TTL = 60 * 60  # seconds a fetched table stays fresh
+
+
+_env_loaded = False
+
+
+class RateError(Exception):
+    """Exchange rates could not be fetched or the currency is unknown"""
+
+
+def load_env():
+    """Load .env into the environment, once"""
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
+
+def get_api_key():
+    """CurrencyFreaks API key (MY_SECRET_KEY)"""
+    load_env()
+    return os.getenv("MY_SECRET_KEY")
+
+def get_rates_ttl():
+    """Seconds a fetched table stays fresh (RATES_TTL, default one hour)"""
+    load_env()
+    return int(os.getenv("RATES_TTL", RATES_TTL))
+
+
+def request_rates(url):
+    """GET a CurrencyFreaks endpoint and return its rates table"""
+    import requests
+
+    try:
+        response = requests.get(url, timeout=10)
+    except requests.exceptions.Timeout:
+        raise RateError("Connection timeout. Please check your internet.")
+    except requests.exceptions.ConnectionError:
+        raise RateError("No internet connection.")
+
+    if response.status_code != 200:
+        raise RateError("Failed to fetch exchange rates")
+
+    try:
+        return response.json()["rates"]
+    except (ValueError, KeyError):
+        raise RateError("Invalid exchange rates response")
+
+
+class RateCache:
+    """USD-based rates table cached in memory and on disk"""
+
+    def __init__(self, api_key=None, cache_file=RATES_FILE, ttl=None):
+        self.api_key = api_key
+        self.cache_file = cache_file
+        self.ttl = ttl  # None: read RATES_TTL from the environment on first use
+
+        self.rates = {}
+        self.fetched_at = 0.0
+        self.stale = False  # True when serving an expired table offline
+        self.in_flight = False  # a background fetch is running
+
+        self._lock = threading.Lock()        # guards in_flight, never held over the network
+        self._fetch_lock = threading.Lock()  # one download at a time (worker threads only)
+        self.load()
+
+    # ===================== DISK =====================
+    def load(self):
+        """Read the last saved snapshot, if any"""
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.rates = data["rates"]
+            self.fetched_at = float(data["fetched_at"])
+        except (OSError, ValueError, KeyError, TypeError):
+            self.rates = {}
+            self.fetched_at = 0.0
+
+    def save(self):
+        """Persist the current snapshot (atomic replace)"""
+        tmp_file = self.cache_file + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({"fetched_at": self.fetched_at, "rates": self.rates}, f)
+        os.replace(tmp_file, self.cache_file)
+
+    # ===================== FETCHING =====================
+    def is_fresh(self):
+        if not self.rates:
+            return False
+        if self.ttl is None:
+            self.ttl = get_rates_ttl()
+        return time.time() - self.fetched_at < self.ttl
+
+    @timed
+    def fetch(self):
+        """Download the latest rates table from CurrencyFreaks"""
+        rates = request_rates(RATES_URL.format(api_key=self.api_key or get_api_key()))
+        self.rates = rates
+        self.fetched_at = time.time()
+        self.stale = False
+        try:
+            self.save()
+        except OSError:
+            pass  # the in-memory table is still good
+        return rates
+
+    def get_rates(self):
+        """Rates table, fetched at most once per TTL (blocks while downloading)"""
+        with self._fetch_lock:
+            if self.is_fresh():
+                return self.rates
+            try:
+                return self.fetch()
+            except RateError:
+                if not self.rates:
+                    raise
+                self.stale = True  # offline: fall back to the last snapshot
+                count("RateCache.stale")
+                return self.rates
+
+    def fetch_async(self, results):
+        """Refresh the table on a worker thread
+
+        Puts None (success) or the RateError on the results queue when done.
+        Returns False if a fetch is already running. Never waits for the
+        network, so it is safe to call on the Tk thread.
+        """
+        with self._lock:
+            if self.in_flight:
+                return False
+            self.in_flight = True
+
+        def worker():
+            error = None
+            try:
+                self.get_rates()
+            except RateError as e:
+                error = e
+            except Exception as e:
+                error = RateError(f"Exchange rate error: {str(e)}")
+            finally:
+                with self._lock:
+                    self.in_flight = False
+            results.put(error)
+
+        threading.Thread(target=worker, daemon=True).start()
+        return True
+
+    def rate_pair(self, currency, base="EGP"):
+        """USD rates of currency and base as Decimals"""
+        self.get_rates()
+        return self.lookup(currency, base)
+
+    def lookup(self, currency, base="EGP"):
+        """Like rate_pair() but only from the table already in memory"""
+        rates = self.rates
+        if not rates:
+            raise RateError("No exchange rates available yet")
+        for code in (currency, base):
+            if code not in rates:
+                raise RateError(f"Currency {code} not found in rates")
+        return to_decimal(rates[currency]), to_decimal(rates[base])
+
+
+class HistoricalRates:
+    """Daily USD-based rates tables stored locally, indexed by (day, currency)"""
+
+    def __init__(self, api_key=None, db_file=HISTORY_FILE):
+        self.api_key = api_key
+        self.db_file = db_file
+        self.in_flight = False
+        self.failed = set()  # days the API could not provide this session
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_file, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rates ("
+            " day TEXT NOT NULL,"
+            " currency TEXT NOT NULL,"
+            " rate TEXT NOT NULL,"
+            " PRIMARY KEY (day, currency)"
+            ") WITHOUT ROWID"
+        )
+        self._db.commit()
+        self.days = {row[0] for row in self._db.execute("SELECT DISTINCT day FROM rates")}
+
+    def has_day(self, day):
+        return day.isoformat() in self.days
+
+    def missing_days(self, days):
+        """Sorted days (before today) that still have to be fetched"""
+        today = date.today()
+        return sorted({
+            d for d in days
+            if d < today and not self.has_day(d) and d not in self.failed
+        })
+
+    def lookup(self, day, currency, base="EGP"):
+        """USD rates of currency and base on day, from the local table only"""
+        with self._lock:
+            found = dict(self._db.execute(
+                "SELECT currency, rate FROM rates WHERE day = ? AND currency IN (?, ?)",
+                (day.isoformat(), currency, base),
+            ))
+        for code in (currency, base):
+            if code not in found:
+                raise RateError(f"No {code} rate for {day.isoformat()}")
+        return to_decimal(found[currency]), to_decimal(found[base])
+
+    def store_day(self, day, rates):
+        """Save the rates table of one day"""
+        key = day.isoformat()
+        with self._lock:
+            with self._db:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO rates (day, currency, rate) VALUES (?, ?, ?)",
+                    ((key, code, str(rate)) for code, rate in rates.items() if rate is not None),
+                )
+            self.days.add(key)
+
+    @timed
+    def fetch_day(self, day):
+        """Download and store the rates table of one day"""
+        url = HISTORY_URL.format(api_key=self.api_key or get_api_key(), day=day.isoformat())
+        rates = request_rates(url)
+        self.store_day(day, rates)
+
+    @timed
+    def backfill(self, days, progress=None):
+        """Fetch every missing day once, return the number of days fetched
+
+        Days that fail are remembered in self.failed and the first error is
+        raised once the other days are done.
+        """
+        missing = self.missing_days(days)
+        fetched = 0
+        error = None
+        for i, day in enumerate(missing, 1):
+            try:
+                self.fetch_day(day)
+                fetched += 1
+            except RateError as e:
+                self.failed.add(day)
+                error = error or e
+            if progress is not None:
+                progress(i, len(missing), day)
+        if error is not None:
+            raise error
+        return fetched
+
+    def fetch_async(self, days, results):
+        """Backfill days on a worker thread, reporting like RateCache.fetch_async()"""
+        with self._lock:
+            if self.in_flight:
+                return False
+            self.in_flight = True
+
+        def worker():
+            error = None
+            try:
+                self.backfill(days)
+            except RateError as e:
+                error = e
+            except Exception as e:
+                error = RateError(f"Exchange rate error: {str(e)}")
+            finally:
+                with self._lock:
+                    self.in_flight = False
+            results.put(error)
+
+        threading.Thread(target=worker, daemon=True).start()
+        return True
+
+    def close(self):
+        self._db.close()
+
+
+# ===================== BACKFILL COMMAND =====================
+def main():
+    from expense_store import ExpenseStore, convert_column
+    from settings import load_settings
+    from storage import open_storage
+
+    parser = argparse.ArgumentParser(description="Historical exchange rates")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill", help="fetch the rates of every expense date")
+    backfill.add_argument("--data", default="expenses.txt", help="expenses file")
+    backfill.add_argument("--db", default="expenses.sqlite3", help="expenses database (if migrated)")
+    backfill.add_argument("--reconvert", action="store_true",
+                          help="re-convert every expense with the rate of its own date")
+    args = parser.parse_args()
+
+    history = HistoricalRates()
+    base = load_settings()["base_currency"]
+
+    # Read-only: rows the loader cannot parse are skipped, not removed
+    store = ExpenseStore(open_storage(args.data, args.db))
+    if store.load(readonly=True):
+        print(f"Skipped {len(store.rejected)} unreadable row(s)")
+    columns = store.columns
+    days = {day for day, currency in zip(columns["date"], columns["currency"]) if currency != base}
+    store.storage.close(compact=False)
+    try:
+        fetched = history.backfill(
+            days, lambda i, n, day: print(f"[{i}/{n}] {day.isoformat()}")
+        )
+        print(f"Fetched {fetched} day(s)")
+    except RateError as e:
+        print(f"Could not fetch {len(history.failed)} day(s): {e}")
+
+    if args.reconvert:
+        storage = open_storage(args.data, args.db)
+        store = ExpenseStore(storage)
+        rejected = store.load()
+        if rejected:
+            print(f"Removed {len(rejected)} unreadable row(s) from the ledger:")
+            for data in rejected:
+                print("  " + "|".join(data))
+
+        def rate_pair(day, currency):
+            if not history.has_day(day):
+                return None
+            try:
+                return history.lookup(day, currency, base)
+            except RateError:
+                return None
+
+        expenses = list(store)
+        results = convert_column(((e.amount, e.currency, e.date) for e in expenses), base, rate_pair)
+        changes = [
+            (idx, expense._replace(converted=converted))
+            for idx, (converted, expense) in enumerate(zip(results, expenses))
+            # rows without a historical rate keep their current value
+            if converted is not None and converted != expense.converted
+        ]
+        store.update_many(changes)
+        storage.close()
+        print(f"Re-converted {len(changes)} expense(s)")
+
+    history.close()
+
+
+if __name__ == "__main__":
+    main()
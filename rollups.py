@@ -0,0 +1,155 @@
+# ===================== ROLLUPS =====================
+# Materialized aggregates • Month / category / payment / currency • No GUI
+# ---------------------------------------------------
+#
+# ExpenseRollups keeps one small table per dimension (month, category,
+# payment method, currency, and month x category for month-end summaries)
+# mapping each value to its row count, converted total, pending count and
+# sum of original amounts. It registers as an ExpenseStore observer and
+# applies every add, update and delete as a delta, so a report reads a few
+# dict entries instead of rescanning the ledger.
+#
+# Like ExpenseIndex, the tables are built on first use and then kept up to
+# date, so loading a ledger that is never reported on costs nothing.
+
+from collections import namedtuple
+from decimal import Decimal
+
+from expense_store import from_cents
+
+ZERO = Decimal("0")
+
+Bucket = namedtuple("Bucket", "count total pending amount")
+# count   rows in the bucket
+# total   sum of the converted amounts (pending rows count as zero)
+# pending rows still waiting for exchange rates
+# amount  sum of the original amounts, only meaningful per currency
+
+
+def month_of(day):
+    """"YYYY-MM" of a date"""
+    return f"{day.year:04d}-{day.month:02d}"
+
+
+DIMENSIONS = {
+    "month": lambda e: month_of(e.date),
+    "category": lambda e: e.category,
+    "payment": lambda e: e.payment,
+    "currency": lambda e: e.currency,
+    "month_category": lambda e: (month_of(e.date), e.category),
+}
+
+
+class ExpenseRollups:
+    """Per-dimension totals over an ExpenseStore, maintained by deltas"""
+
+    def __init__(self, store):
+        self.store = store
+        self.built = False
+        self.tables = {}  # dimension -> {value: [count, total, pending, amount]}
+        store.observers.append(self)
+
+    # ===================== MAINTENANCE =====================
+    def reset(self):
+        """Drop everything, the next read rebuilds"""
+        self.built = False
+        self.tables = {}
+
+    def build(self):
+        columns = self.store.columns
+        months = {}  # date -> month, there are far fewer days than rows
+
+        # One pass into the finest groups (integer cents, the column type),
+        # then every dimension sums those
+        groups = {}
+        for amount, currency, converted, category, payment, day in zip(
+            columns["amount"], columns["currency"], columns["converted"],
+            columns["category"], columns["payment"], columns["date"],
+        ):
+            month = months.get(day)
+            if month is None:
+                month = months[day] = month_of(day)
+            group = (month, category, payment, currency)
+            bucket = groups.get(group)
+            if bucket is None:
+                bucket = groups[group] = [0, 0, 0, 0]
+            bucket[0] += 1
+            if converted is None:
+                bucket[2] += 1
+            else:
+                bucket[1] += converted
+            bucket[3] += amount
+
+        self.tables = {name: {} for name in DIMENSIONS}
+        for (month, category, payment, currency), group in groups.items():
+            for name, value in (
+                ("month", month), ("category", category), ("payment", payment),
+                ("currency", currency), ("month_category", (month, category)),
+            ):
+                bucket = self.tables[name].setdefault(value, [0, 0, 0, 0])
+                for i in range(4):
+                    bucket[i] += group[i]
+        for table in self.tables.values():
+            for bucket in table.values():
+                bucket[1] = from_cents(bucket[1])
+                bucket[3] = from_cents(bucket[3])
+        self.built = True
+
+    def row_added(self, key, expense):
+        if self.built:
+            self._count(expense, 1)
+
+    def row_removed(self, key, expense):
+        if self.built:
+            self._count(expense, -1)
+
+    def _count(self, expense, sign):
+        converted = expense.converted
+        pending = converted is None
+        converted = ZERO if pending else converted
+        amount = expense.amount
+        if sign < 0:
+            converted = -converted
+            amount = -amount
+        for name, key_of in DIMENSIONS.items():
+            table = self.tables[name]
+            value = key_of(expense)
+            bucket = table.get(value)
+            if bucket is None:
+                bucket = table[value] = [0, ZERO, 0, ZERO]
+            bucket[0] += sign
+            if bucket[0] == 0:
+                del table[value]
+                continue
+            bucket[1] += converted
+            if pending:
+                bucket[2] += sign
+            bucket[3] += amount
+
+    # ===================== API =====================
+    def table(self, dimension):
+        """{value: Bucket} of one dimension"""
+        if not self.built:
+            self.build()
+        return {value: Bucket(*bucket) for value, bucket in self.tables[dimension].items()}
+
+    def report(self, dimension):
+        """(value, Bucket) pairs: months in order, the others by total, largest first"""
+        rows = list(self.table(dimension).items())
+        if dimension in ("month", "month_category"):
+            rows.sort(key=lambda item: item[0])
+        else:
+            rows.sort(key=lambda item: (-item[1].total, item[0]))
+        return rows
+
+    def month_summary(self, month):
+        """(category, Bucket) pairs of one "YYYY-MM" month, largest total first"""
+        if not self.built:
+            self.build()
+        rows = [
+            (category, Bucket(*bucket))
+            for (bucket_month, category), bucket in self.tables["month_category"].items()
+            if bucket_month == month
+        ]
+        rows.sort(key=lambda item: (-item[1].total, item[0]))
+        return rows
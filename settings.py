@@ -0,0 +1,32 @@
+# ===================== SETTINGS =====================
+# User preferences kept between runs • settings.json
+# ----------------------------------------------------
+#
+# Settings changed from inside the app (unlike the API key and RATES_TTL,
+# which live in .env). Missing or unreadable files fall back to DEFAULTS.
+
+import json
+import os
+
+SETTINGS_FILE = "settings.json"
+DEFAULTS = {
+    "base_currency": "EGP",  # currency of the converted column and the totals
+}
+
+
+def load_settings(settings_file=SETTINGS_FILE):
+    """Saved settings on top of the defaults"""
+    settings = dict(DEFAULTS)
+    try:
+        with open(settings_file, "r", encoding="utf-8") as f:
+            settings.update(json.load(f))
+    except (OSError, ValueError, TypeError):
+        pass
+    return settings
+
+def save_settings(settings, settings_file=SETTINGS_FILE):
+    """Write the settings (atomic replace)"""
+    tmp_file = settings_file + ".tmp"
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(settings, f, indent=2)
+    os.replace(tmp_file, settings_file)
@@ -0,0 +1,99 @@
+# ===================== SORT INDEX =====================
+# Maintained sort orders • Typed keys • Permutation lookups
+# ------------------------------------------------------
+#
+# Sorting the table by a column reads a permutation kept here instead of
+# sorting the rows on every click. For each column that has been sorted
+# once, the index holds a sorted list of (sort value, ordering key) pairs
+# (see ExpenseStore.keys). The sort values are the store's typed column
+# values, not the formatted strings: integer cents for amounts (pending
+# conversions last), shared date objects for dates and the strings
+# themselves for the rest, so "100.00" sorts after "9.50" and dates sort
+# by day.
+#
+# After the first sort of a column, re-sorting it or switching back to it
+# is one pass over its pairs, and the store's row_added / row_removed
+# calls keep every built order up to date with a bisect each. Ties keep
+# the display order of the rows in both directions: a descending sort is
+# a stable sort of the pairs by value alone, not their reverse.
+
+import math
+from bisect import bisect_left, insort
+from operator import itemgetter
+
+from expense_store import COLUMNS, pack
+
+PENDING_LAST = math.inf  # sort value of a converted amount still pending
+
+
+def sort_value(field, value):
+    """Sort value of a column value"""
+    if value is None and field == "converted":
+        return PENDING_LAST
+    return value
+
+def ordered(pairs, descending):
+    """Sorted (sort value, key) pairs in the wanted direction, ties in key order"""
+    if not descending:
+        return pairs
+    return sorted(pairs, key=itemgetter(0), reverse=True)  # stable: ties stay ascending
+
+
+class SortIndex:
+    """Sort orders of the columns of an ExpenseStore, built on first use"""
+
+    def __init__(self, store):
+        self.store = store
+        self.orders = {}  # field -> sorted (sort value, key)
+        store.observers.append(self)
+
+    # ===================== MAINTENANCE =====================
+    def reset(self):
+        """Drop every order, the next sort rebuilds"""
+        self.orders = {}
+
+    def build(self, field):
+        column = self.store.columns[field]
+        order = sorted(zip((sort_value(field, value) for value in column), self.store.keys))
+        self.orders[field] = order
+        return order
+
+    def row_added(self, key, expense):
+        if not self.orders:
+            return
+        values = dict(zip(COLUMNS, pack(expense)))
+        for field, order in self.orders.items():
+            insort(order, (sort_value(field, values[field]), key))
+
+    def row_removed(self, key, expense):
+        if not self.orders:
+            return
+        values = dict(zip(COLUMNS, pack(expense)))
+        for field, order in self.orders.items():
+            del order[bisect_left(order, (sort_value(field, values[field]), key))]
+
+    # ===================== LOOKUP =====================
+    def keys(self, field, descending=False, among=None):
+        """Ordering keys sorted by a column
+
+        among (ordering keys in display order, e.g. from
+        ExpenseIndex.search()) limits the result to those rows, otherwise
+        every row is returned.
+        """
+        order = self.orders.get(field)
+        if order is None:
+            order = self.build(field)
+        if among is None:
+            return [key for _, key in ordered(order, descending)]
+        if len(among) * 8 > len(order):
+            # Large subset: one pass over the order beats sorting it
+            wanted = set(among)
+            return [key for _, key in ordered(order, descending) if key in wanted]
+        column = self.store.columns[field]
+        index_of = self.store.index_of
+        # Stable, so ties keep among's display order in both directions
+        return sorted(
+            among,
+            key=lambda key: sort_value(field, column[index_of(key)]),
+            reverse=descending
+        )
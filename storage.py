@@ -0,0 +1,311 @@
+# ===================== STORAGE BACKENDS =====================
+# Pluggable persistence • Text journal or SQLite • One-shot migration
+# ------------------------------------------------------------
+#
+# ExpenseStore persists through a backend object with this interface
+# (rows are lists of strings in the expenses.txt format):
+#
+#     open()             -> recovered rows, in display order
+#     read()             -> same, without opening for writing
+#     insert(idx, row) / update(idx, row) / delete(idx)
+#     insert_many(idx, rows) / update_many([(idx, row), ...]) / delete_many(indices)
+#                        -> one write / one transaction for the batch
+#     prepend(row)       -> insert at the top without open(), for one-shot
+#                           writers (False: nothing written, open() first)
+#     compact(wait=False), close(compact=True)
+#     snapshot           -> set by the store (used by the text journal)
+#
+# ExpenseJournal (journal.py) is the text backend. SqliteStorage keeps the
+# rows in a WAL-mode SQLite file with typed columns (amounts in integer
+# cents) and indexes on expense date, due date, category and currency, so
+# filters and sums run as indexed queries instead of Python loops.
+#
+# "python storage.py migrate" copies expenses.txt into expenses.sqlite3
+# once; from then on the app uses the database.
+
+import argparse
+import os
+import sqlite3
+from expense_store import PENDING, from_cents, parse_values, to_cents
+from instrument import timed
+from journal import ExpenseJournal
+
+DATA_FILE = "expenses.txt"
+DB_FILE = "expenses.sqlite3"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS expenses (
+    id INTEGER PRIMARY KEY,
+    pos REAL NOT NULL,
+    amount_cents INTEGER NOT NULL,
+    currency TEXT NOT NULL,
+    converted_cents INTEGER,
+    category TEXT NOT NULL,
+    payment TEXT NOT NULL,
+    expense_date TEXT NOT NULL,
+    due_date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_expenses_pos ON expenses (pos);
+CREATE INDEX IF NOT EXISTS idx_expenses_date ON expenses (expense_date);
+CREATE INDEX IF NOT EXISTS idx_expenses_due_date ON expenses (due_date);
+CREATE INDEX IF NOT EXISTS idx_expenses_category ON expenses (category, expense_date);
+CREATE INDEX IF NOT EXISTS idx_expenses_currency ON expenses (currency, expense_date);
+"""
+
+COLUMNS_SQL = (
+    "amount_cents, currency, converted_cents, category, payment, expense_date, due_date"
+)
+SELECT_SQL = f"SELECT id, pos, {COLUMNS_SQL} FROM expenses"
+INSERT_SQL = f"INSERT INTO expenses (pos, {COLUMNS_SQL}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+UPDATE_SQL = (
+    "UPDATE expenses SET amount_cents = ?, currency = ?, converted_cents = ?,"
+    " category = ?, payment = ?, expense_date = ?, due_date = ? WHERE id = ?"
+)
+DELETE_SQL = "DELETE FROM expenses WHERE id = ?"
+
+
+# ===================== ROW CONVERSION =====================
+# Cents are rounded and formatted by expense_store, so an amount gets the
+# same cents whichever backend stores it.
+def row_to_record(row):
+    """File-format row of strings -> column values for SQL"""
+    amount, currency, converted, category, payment, exp_date, due_date = row
+    return (
+        to_cents(amount),
+        currency,
+        None if converted == PENDING else to_cents(converted),
+        category,
+        payment,
+        exp_date,
+        due_date,
+    )
+
+def record_to_row(record):
+    """SQL column values -> file-format row of strings"""
+    amount, currency, converted, category, payment, exp_date, due_date = record
+    return [
+        f"{from_cents(amount):.2f}",
+        currency,
+        PENDING if converted is None else f"{from_cents(converted):.2f}",
+        category,
+        payment,
+        exp_date,
+        due_date,
+    ]
+
+
+# ===================== SQLITE BACKEND =====================
+class SqliteStorage:
+    """Expenses in an indexed SQLite table, ordered by a position key"""
+
+    def __init__(self, db_file=DB_FILE):
+        self.db_file = db_file
+        self.snapshot = None  # unused, every change is written in place
+
+        self.ids = []   # row id of each position
+        self.pos = []   # ordering key of each position
+
+        self._db = None
+
+    def connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = NORMAL")
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    @timed
+    def open(self):
+        """Load every row in display order"""
+        db = self.connect()
+        self.ids = []
+        self.pos = []
+        rows = []
+        for record in db.execute(f"{SELECT_SQL} ORDER BY pos"):
+            self.ids.append(record[0])
+            self.pos.append(record[1])
+            rows.append(record_to_row(record[2:]))
+        return rows
+
+    read = open
+
+    # ===================== CHANGES =====================
+    def _pos_for(self, idx, count=1):
+        """count ordering keys that sort between the neighbours of idx"""
+        if not self.pos:
+            return [float(i) for i in range(count)]
+        if idx <= 0:
+            first = self.pos[0]
+            return [first - count + i for i in range(count)]
+        if idx >= len(self.pos):
+            last = self.pos[-1]
+            return [last + 1 + i for i in range(count)]
+        before, after = self.pos[idx - 1], self.pos[idx]
+        step = (after - before) / (count + 1)
+        keys = [before + step * (i + 1) for i in range(count)]
+        if before < keys[0] and keys[-1] < after and len(set(keys)) == count:
+            return keys
+        self._renumber()  # keys too close together, spread them out again
+        return self._pos_for(idx, count)
+
+    def _renumber(self):
+        self.pos = [float(i) for i in range(len(self.ids))]
+        with self._db:
+            self._db.executemany(
+                "UPDATE expenses SET pos = ? WHERE id = ?", zip(self.pos, self.ids)
+            )
+
+    def insert(self, idx, row):
+        (pos,) = self._pos_for(idx)
+        with self._db:
+            cursor = self._db.execute(INSERT_SQL, (pos, *row_to_record(row)))
+        self.ids.insert(idx, cursor.lastrowid)
+        self.pos.insert(idx, pos)
+
+    def insert_many(self, idx, rows):
+        positions = self._pos_for(idx, len(rows))
+        ids = []
+        with self._db:
+            for pos, row in zip(positions, rows):
+                ids.append(self._db.execute(INSERT_SQL, (pos, *row_to_record(row))).lastrowid)
+        self.ids[idx:idx] = ids
+        self.pos[idx:idx] = positions
+
+    def prepend(self, row):
+        """Insert a row at the top without loading the rows (one INSERT)"""
+        db = self.connect()
+        with db:
+            (first,) = db.execute("SELECT MIN(pos) FROM expenses").fetchone()
+            db.execute(INSERT_SQL, (0.0 if first is None else first - 1, *row_to_record(row)))
+        return True
+
+    def update(self, idx, row):
+        with self._db:
+            self._db.execute(UPDATE_SQL, (*row_to_record(row), self.ids[idx]))
+
+    def update_many(self, items):
+        with self._db:
+            self._db.executemany(
+                UPDATE_SQL, ((*row_to_record(row), self.ids[idx]) for idx, row in items)
+            )
+
+    def delete(self, idx):
+        with self._db:
+            self._db.execute(DELETE_SQL, (self.ids[idx],))
+        del self.ids[idx]
+        del self.pos[idx]
+
+    def delete_many(self, indices):
+        drop = set(indices)
+        with self._db:
+            self._db.executemany(DELETE_SQL, ((self.ids[idx],) for idx in sorted(drop)))
+        self.ids = [row_id for i, row_id in enumerate(self.ids) if i not in drop]
+        self.pos = [pos for i, pos in enumerate(self.pos) if i not in drop]
+
+    def compact(self, wait=False):
+        """Fold the WAL back into the database file"""
+        self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self, compact=True):
+        if self._db is None:
+            return
+        if compact:
+            self._db.execute("PRAGMA optimize")
+        self._db.close()
+        self._db = None
+
+    # ===================== QUERIES =====================
+    @staticmethod
+    def _where(start=None, end=None, category=None, currency=None, payment=None):
+        clauses = []
+        params = []
+        if category is not None:
+            clauses.append("category = ?")
+            params.append(category)
+        if currency is not None:
+            clauses.append("currency = ?")
+            params.append(currency)
+        if payment is not None:
+            clauses.append("payment = ?")
+            params.append(payment)
+        if start is not None:
+            clauses.append("expense_date >= ?")
+            params.append(start.isoformat())
+        if end is not None:
+            clauses.append("expense_date <= ?")
+            params.append(end.isoformat())
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    @timed
+    def query(self, **filters):
+        """Rows matching the filters (start/end date, category, currency, payment)"""
+        where, params = self._where(**filters)
+        db = self.connect()
+        return [
+            record_to_row(record[2:])
+            for record in db.execute(f"{SELECT_SQL}{where} ORDER BY pos", params)
+        ]
+
+    @timed
+    def total(self, **filters):
+        """Sum of the converted amounts matching the filters, as a Decimal"""
+        where, params = self._where(**filters)
+        db = self.connect()
+        (cents,) = db.execute(
+            f"SELECT COALESCE(SUM(converted_cents), 0) FROM expenses{where}", params
+        ).fetchone()
+        return from_cents(cents)
+
+
+# ===================== SELECTION / MIGRATION =====================
+def open_storage(data_file=DATA_FILE, db_file=DB_FILE):
+    """The SQLite backend once migrated, otherwise the text journal"""
+    if os.path.exists(db_file):
+        return SqliteStorage(db_file)
+    return ExpenseJournal(data_file)
+
+def migrate(data_file=DATA_FILE, db_file=DB_FILE):
+    """Copy the text ledger into a new SQLite database, return the row count"""
+    if os.path.exists(db_file):
+        raise FileExistsError(f"{db_file} already exists")
+
+    rows = ExpenseJournal(data_file).read()
+    records = []
+    for row in rows:
+        try:
+            parse_values(row)  # same check as the loader, bad dates included
+            records.append((float(len(records)), *row_to_record(row)))
+        except (ValueError, ArithmeticError):
+            continue  # rows the text loader would skip
+
+    storage = SqliteStorage(db_file + ".tmp")
+    try:
+        db = storage.connect()
+        with db:
+            db.executemany(INSERT_SQL, records)
+        storage.close()
+        os.replace(db_file + ".tmp", db_file)
+    finally:
+        for suffix in (".tmp", ".tmp-wal", ".tmp-shm"):
+            if os.path.exists(db_file + suffix):
+                os.remove(db_file + suffix)
+    return len(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expenses storage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_cmd = commands.add_parser("migrate", help="move expenses.txt into SQLite")
+    migrate_cmd.add_argument("--data", default=DATA_FILE, help="expenses text file")
+    migrate_cmd.add_argument("--db", default=DB_FILE, help="SQLite database to create")
+    args = parser.parse_args()
+
+    count = migrate(args.data, args.db)
+    print(f"Migrated {count} expense(s) from {args.data} to {args.db}")
+    print(f"{args.data} is kept as a backup and no longer used")
+
+
+if __name__ == "__main__":
+    main()
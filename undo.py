@@ -0,0 +1,172 @@
+# ===================== UNDO / REDO =====================
+# Command log • Per-row diffs • Bounded depth • No GUI imports
+# -------------------------------------------------------
+#
+# Every change made through an UndoLog is kept as a small command object
+# holding only what it needs to be reverted: the rows it inserted or
+# deleted (with their positions), or for updates just the fields that
+# changed, old and new value. Nothing is ever snapshotted whole, and the
+# log keeps the last `depth` commands.
+#
+# Commands apply and revert themselves with the store's batch calls
+# (insert_many / update_many / delete_many), so undoing a bulk edit of
+# 1,000 rows is one update_many: one journal write or one SQLite
+# transaction, and one observer reset instead of 1,000 row events.
+#
+# Positions stay valid because undo and redo are strictly last-in,
+# first-out: when a command is reverted, every later command has already
+# been reverted. Changes that move rows without going through the log
+# must call clear(). Changes that keep rows in place (filling in pending
+# conversions) don't have to.
+
+from collections import deque
+
+from expense_store import COLUMNS
+
+UNDO_DEPTH = 100  # commands kept for undo
+
+
+def plural(count, noun="expense"):
+    return f"{count} {noun}" if count == 1 else f"{count} {noun}s"
+
+
+# ===================== COMMANDS =====================
+class Insert:
+    """Rows inserted at idx, in order"""
+
+    __slots__ = ("idx", "expenses")
+
+    def __init__(self, idx, expenses):
+        self.idx = idx
+        self.expenses = expenses
+
+    def apply(self, store):
+        store.insert_many(self.idx, self.expenses)
+
+    def revert(self, store):
+        store.delete_many(range(self.idx, self.idx + len(self.expenses)))
+
+    def describe(self):
+        return f"add {plural(len(self.expenses))}"
+
+class Delete:
+    """Deleted rows as (position before the delete, expense), ascending"""
+
+    __slots__ = ("items",)
+
+    def __init__(self, items):
+        self.items = items
+
+    def apply(self, store):
+        store.delete_many([idx for idx, _ in self.items])
+
+    def revert(self, store):
+        # Ascending re-inserts put every row back at its old position,
+        # consecutive rows go back in one batch
+        run = []
+        for idx, expense in self.items:
+            if run and idx != run[0][0] + len(run):
+                store.insert_many(run[0][0], [e for _, e in run])
+                run = []
+            run.append((idx, expense))
+        if run:
+            store.insert_many(run[0][0], [e for _, e in run])
+
+    def describe(self):
+        return f"delete {plural(len(self.items))}"
+
+class Update:
+    """Changed fields of updated rows: (idx, {field: (old, new)})"""
+
+    __slots__ = ("changes",)
+
+    def __init__(self, changes):
+        self.changes = changes
+
+    def _set(self, store, side):
+        store.update_many([
+            (idx, store.row(idx)._replace(**{field: values[side] for field, values in diff.items()}))
+            for idx, diff in self.changes
+        ])
+
+    def apply(self, store):
+        self._set(store, 1)
+
+    def revert(self, store):
+        self._set(store, 0)
+
+    def describe(self):
+        return f"edit {plural(len(self.changes))}"
+
+def diff(old, new):
+    """{field: (old, new)} of the fields that differ between two expenses"""
+    return {
+        field: (before, after)
+        for field, before, after in zip(COLUMNS, old, new)
+        if before != after
+    }
+
+
+# ===================== LOG =====================
+class UndoLog:
+    """Store changes that can be undone and redone"""
+
+    def __init__(self, store, depth=UNDO_DEPTH):
+        self.store = store
+        self.done = deque(maxlen=depth)
+        self.undone = []
+
+    def _do(self, command):
+        command.apply(self.store)
+        self.done.append(command)
+        self.undone.clear()
+
+    # Same calls as ExpenseStore
+    def insert(self, idx, expense):
+        self._do(Insert(idx, [expense]))
+
+    def insert_many(self, idx, expenses):
+        expenses = list(expenses)
+        if expenses:
+            self._do(Insert(idx, expenses))
+
+    def update(self, idx, expense):
+        self.update_many([(idx, expense)])
+
+    def update_many(self, items):
+        changes = [(idx, diff(self.store.row(idx), expense)) for idx, expense in items]
+        changes = [(idx, change) for idx, change in changes if change]
+        if changes:
+            self._do(Update(changes))
+
+    def delete(self, idx):
+        self.delete_many([idx])
+
+    def delete_many(self, indices):
+        positions = sorted(set(indices))
+        if positions:
+            self._do(Delete([(idx, self.store.row(idx)) for idx in positions]))
+
+    # Undo / redo
+    def undo(self):
+        """Revert the last command, return it (None if there is nothing to undo)"""
+        if not self.done:
+            return None
+        command = self.done.pop()
+        command.revert(self.store)
+        self.undone.append(command)
+        return command
+
+    def redo(self):
+        """Apply the last undone command again, return it (None if there is none)"""
+        if not self.undone:
+            return None
+        command = self.undone.pop()
+        command.apply(self.store)
+        self.done.append(command)
+        return command
+
+    def clear(self):
+        """Forget every command (after a change that did not go through the log)"""
+        self.done.clear()
+        self.undone.clear()
@@ -0,0 +1,114 @@
+# ===================== VALIDATION =====================
+# Input checks shared by the GUI, bulk import and the CLI • No GUI imports
+# ------------------------------------------------------
+#
+# The validate_* functions return (True, value) or (False, message), like
+# they did inside ExpensesTrackerGPT.py. validate_record() applies them to
+# one imported record and builds a typed Expense, raising ValueError with
+# the reasons when the record is rejected.
+
+import re
+from datetime import datetime
+from functools import lru_cache
+
+from expense_store import Expense, quantize
+
+DEFAULT_CATEGORY = "Other"
+DEFAULT_PAYMENT = "Bank Transfer"
+
+
+def validate_amount(amount_str):
+    """Validate amount input"""
+    if not amount_str or amount_str.strip() == "":
+        return False, "Amount is required"
+
+    # Remove spaces and check for valid number format
+    amount_str = amount_str.strip()
+
+    # Allow decimal numbers with optional comma separators
+    if not re.match(r'^\d+\.?\d*$', amount_str):
+        return False, "Invalid amount format. Use numbers only (e.g., 100 or 100.50)"
+
+    try:
+        amount = float(amount_str)
+        if amount <= 0:
+            return False, "Amount must be greater than zero"
+        if amount > 999999999:
+            return False, "Amount is too large"
+        return True, amount
+    except ValueError:
+        return False, "Invalid number format"
+
+def validate_currency(currency_str, currencies):
+    """Validate currency code against a collection of ISO codes"""
+    if not currency_str or currency_str.strip() == "":
+        return False, "Currency is required"
+
+    currency_str = currency_str.strip().upper()
+
+    if len(currency_str) != 3:
+        return False, "Currency code must be 3 letters (e.g., USD, EUR, SAR)"
+
+    # Check if valid ISO currency code
+    if currency_str in currencies:
+        return True, currency_str
+    return False, f"Invalid currency code: {currency_str}"
+
+def validate_date(date_str):
+    """Validate date format"""
+    try:
+        datetime.strptime(date_str, "%Y-%m-%d")
+        return True, date_str
+    except (TypeError, ValueError):
+        return False, "Invalid date format"
+
+
+# ===================== RECORDS =====================
+@lru_cache(maxsize=4096)
+def parse_date(date_str):
+    """Date of a YYYY-MM-DD string, None if invalid (cached, imports repeat days a lot)"""
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        return None
+
+def validate_record(record, currencies):
+    """Expense from a dict of strings (amount, currency, category, payment, date, due_date)
+
+    Thousands separators and a leading minus sign (bank exports show spending
+    as negative amounts) are dropped from the amount. A missing due date is
+    the expense date. Raises ValueError listing every problem found.
+    """
+    errors = []
+
+    amount = (record.get("amount") or "").strip().replace(",", "").lstrip("-")
+    is_valid, result = validate_amount(amount)
+    if not is_valid:
+        errors.append(result)
+
+    is_valid, currency = validate_currency(record.get("currency"), currencies)
+    if not is_valid:
+        errors.append(currency)
+
+    exp_text = (record.get("date") or "").strip()
+    exp_date = parse_date(exp_text)
+    if exp_date is None:
+        errors.append(f"Invalid date format: {exp_text!r}")
+
+    due_text = (record.get("due_date") or "").strip()
+    due_date = parse_date(due_text) if due_text else exp_date
+    if due_text and due_date is None:
+        errors.append(f"Invalid due date format: {due_text!r}")
+
+    if errors:
+        raise ValueError("; ".join(errors))
+
+    return Expense(
+        quantize(amount),
+        currency,
+        None,  # converted later, with one rate snapshot for the whole batch
+        (record.get("category") or "").strip() or DEFAULT_CATEGORY,
+        (record.get("payment") or "").strip() or DEFAULT_PAYMENT,
+        exp_date,
+        due_date,
+    )